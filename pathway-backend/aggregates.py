@@ -0,0 +1,379 @@
+"""
+Incrementally maintained views over the mock Pathway streams.
+
+Every view here is a StreamStore listener (see stream_store.py): it is fed
+each appended record once and keeps its result up to date, so endpoints
+read it in O(1) instead of rescanning the stream.
+"""
+
+import heapq
+import time
+from datetime import datetime
+from operator import itemgetter
+from typing import Dict, List
+
+
+def green_score(record: Dict) -> float:
+    """Green score used across the mock servers for a wholesaler record."""
+    return (record.get("carbon_saved_kg", 0) * 1.5) + (record.get("waste_reduced_kg", 0) * 2.0)
+
+
+def listing_slot(slots: Dict, record: Dict) -> tuple:
+    """``(slot, is_new)`` for a wholesaler listing.
+
+    Slots are numbered 0, 1, 2... by first appearance of each
+    ``wholesaler_id`` (listings without one always get a new slot), so all
+    views over the same stream agree on the numbering.
+    """
+    key = record.get("wholesaler_id")
+    if key is None:
+        key = ("anonymous", len(slots))
+    slot = slots.get(key)
+    if slot is None:
+        slot = slots[key] = len(slots)
+        return slot, True
+    return slot, False
+
+
+class GreenTotals:
+    """Running sums of the sustainability metrics for a group of listings."""
+
+    __slots__ = ("carbon", "waste", "green", "count")
+
+    def __init__(self):
+        self.carbon = 0
+        self.waste = 0
+        self.green = 0
+        self.count = 0
+
+    def add(self, record: Dict, sign: int = 1):
+        self.carbon += sign * record.get("carbon_saved_kg", 0)
+        self.waste += sign * record.get("waste_reduced_kg", 0)
+        self.green += sign * green_score(record)
+        self.count += sign
+
+    def to_dict(self) -> Dict:
+        return {
+            "total_carbon_saved": self.carbon,
+            "total_waste_reduced": self.waste,
+            "total_green_score": self.green,
+            "listings": self.count,
+        }
+
+
+class WholesalerAggregates:
+    """Totals over the latest record per ``wholesaler_id``.
+
+    A record for an id we have already seen replaces the old one: its
+    contribution is retracted from every aggregate before the new one is
+    added. Records without an id are treated as distinct listings.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self._current: Dict = {}
+        self._anonymous = 0
+        self.totals = GreenTotals()
+        self.by_region: Dict[str, GreenTotals] = {}
+        self.by_product: Dict[str, GreenTotals] = {}
+
+    def on_record(self, record: Dict):
+        key = record.get("wholesaler_id")
+        if key is None:
+            key = ("anonymous", self._anonymous)
+            self._anonymous += 1
+
+        old = self._current.get(key)
+        if old is not None:
+            self._apply(old, -1)
+        self._current[key] = record
+        self._apply(record, 1)
+
+    def _apply(self, record: Dict, sign: int):
+        self.totals.add(record, sign)
+        self._apply_group(self.by_region, record.get("region", "Unknown"), record, sign)
+        self._apply_group(self.by_product, record.get("product_name", "Unknown"), record, sign)
+
+    @staticmethod
+    def _apply_group(groups: Dict[str, GreenTotals], name: str, record: Dict, sign: int):
+        totals = groups.get(name)
+        if totals is None:
+            totals = groups[name] = GreenTotals()
+        totals.add(record, sign)
+        if totals.count == 0:
+            del groups[name]
+
+    def breakdown(self, field: str) -> List[Dict]:
+        """Per-region or per-product totals, greenest group first."""
+        groups = self.by_region if field == "region" else self.by_product
+        rows = [{field: name, **totals.to_dict()} for name, totals in groups.items()]
+        rows.sort(key=lambda row: row["total_green_score"], reverse=True)
+        return rows
+
+
+class BoundedTopK:
+    """The ``k`` largest entries of a live ``{key: value}`` dict.
+
+    ``offer()`` keeps the members current in O(k) as values grow. A member
+    that shrinks or is discarded can be overtaken by any other key, so it
+    marks the structure dirty and the next read rebuilds it from ``values``.
+    """
+
+    def __init__(self, k: int, values: Dict):
+        self.k = k
+        self.values = values
+        self._members: Dict = {}
+        self._dirty = False
+
+    def offer(self, key, value):
+        if self._dirty:
+            return
+        members = self._members
+        if key in members:
+            if value >= members[key]:
+                members[key] = value
+            else:
+                self._dirty = True
+            return
+        if len(members) < self.k:
+            members[key] = value
+            return
+        weakest = min(members, key=members.get)
+        if value > members[weakest]:
+            del members[weakest]
+            members[key] = value
+
+    def discard(self, key):
+        if key in self._members:
+            self._dirty = True
+
+    def clear(self):
+        self._members = {}
+        self._dirty = False
+
+    def invalidate(self):
+        """Rebuild from ``values`` on the next read (after they changed in bulk)."""
+        self._dirty = True
+
+    def items(self) -> List:
+        """Members as ``(key, value)`` pairs, largest first."""
+        if self._dirty:
+            self._members = dict(heapq.nlargest(self.k, self.values.items(), key=itemgetter(1)))
+            self._dirty = False
+        return sorted(self._members.items(), key=itemgetter(1), reverse=True)
+
+
+class SlidingCounts:
+    """Per-key sums over the last ``window`` seconds, kept in fixed-size time buckets.
+
+    The clock is the newest event time added (as in ``SearchTrends``), so
+    historical or replayed streams keep their windows. When it moves past
+    a bucket, the bucket is subtracted from the running totals, so reads
+    never rescan history. Keys are ``(group, member)`` pairs; the largest
+    totals are tracked overall and per group in ``BoundedTopK`` structures.
+    """
+
+    def __init__(self, window: int, bucket: int = 60, k: int = 10):
+        self.window = window
+        self.bucket = bucket
+        self.k = k
+        self.totals: Dict = {}
+        self.top = BoundedTopK(k, self.totals)
+        self.groups: Dict = {}
+        self.group_top: Dict = {}
+        self._span = window // bucket
+        self._buckets: Dict[int, Dict] = {}
+        self._order: List[int] = []
+        self._newest = 0
+
+    def add(self, key, amount, ts: float):
+        bucket_id = int(ts // self.bucket)
+        if bucket_id > self._newest:
+            self._newest = bucket_id
+            self._expire()
+        elif bucket_id <= self._newest - self._span:
+            return  # arrived after its bucket already left the window
+        bucket = self._buckets.get(bucket_id)
+        if bucket is None:
+            bucket = self._buckets[bucket_id] = {}
+            heapq.heappush(self._order, bucket_id)
+        bucket[key] = bucket.get(key, 0) + amount
+        self._change(key, amount)
+
+    def _expire(self):
+        cutoff = self._newest - self._span
+        while self._order and self._order[0] <= cutoff:
+            for key, amount in self._buckets.pop(heapq.heappop(self._order)).items():
+                self._change(key, -amount)
+
+    def _change(self, key, amount):
+        group, member = key
+        members = self.groups.get(group)
+        if members is None:
+            members = self.groups[group] = {}
+            self.group_top[group] = BoundedTopK(self.k, members)
+        total = self.totals.get(key, 0) + amount
+        if total:
+            self.totals[key] = members[member] = total
+        else:
+            self.totals.pop(key, None)
+            members.pop(member, None)
+        if amount >= 0 and total:
+            self.top.offer(key, total)
+            self.group_top[group].offer(member, total)
+        else:
+            # A shrinking (or emptied) leader can be overtaken by keys we are not tracking
+            self.top.discard(key)
+            self.group_top[group].discard(member)
+        if not members:
+            del self.groups[group]
+            del self.group_top[group]
+
+
+class PurchaseLeaderboard:
+    """Purchased quantity per (product, wholesaler), with bounded top-k views.
+
+    All-time leaders are kept globally and per product in ``BoundedTopK``
+    structures, so reads never sort the full key space. Time-windowed
+    leaders come from ``SlidingCounts`` over the purchase ``timestamp``
+    (ISO or epoch seconds), or the ingest time for events without one;
+    each window ends at the newest purchase seen.
+    """
+
+    def __init__(self, k: int = 10, windows: Dict[str, int] = None):
+        self.k = k
+        self.window_seconds = windows or {"1h": 3600, "1d": 86400}
+        self.reset()
+
+    def reset(self):
+        self.counts: Dict = {}
+        self.top = BoundedTopK(self.k, self.counts)
+        self.by_product: Dict[str, Dict] = {}
+        self.product_top: Dict[str, BoundedTopK] = {}
+        self.windows = {name: SlidingCounts(seconds, k=self.k) for name, seconds in self.window_seconds.items()}
+
+    def on_record(self, record: Dict):
+        product = record.get("product_name", "Unknown")
+        wholesaler = record.get("wholesaler_name", "Unknown")
+        quantity = record.get("quantity", 1)
+        key = (product, wholesaler)
+
+        total = self.counts[key] = self.counts.get(key, 0) + quantity
+        product_counts = self.by_product.get(product)
+        if product_counts is None:
+            product_counts = self.by_product[product] = {}
+            self.product_top[product] = BoundedTopK(self.k, product_counts)
+        product_counts[wholesaler] = product_counts.get(wholesaler, 0) + quantity
+
+        if quantity >= 0:
+            self.top.offer(key, total)
+            self.product_top[product].offer(wholesaler, product_counts[wholesaler])
+        else:
+            # Returns can push a leader below keys we are not tracking
+            self.top.discard(key)
+            self.product_top[product].discard(wholesaler)
+
+        ts = event_time(record)
+        for window in self.windows.values():
+            window.add(key, quantity, ts)
+
+    def leaders(self, k: int = 5, product: str = None, window: str = None) -> List[Dict]:
+        """Top ``k`` (capped at the tracked size) leaders, optionally per product or window."""
+        if window is not None:
+            counts = self.windows[window]
+            if product is not None:
+                top = counts.group_top.get(product)
+                ranked = [((product, w), v) for w, v in top.items()[:k]] if top else []
+            else:
+                ranked = counts.top.items()[:k]
+        elif product is not None:
+            top = self.product_top.get(product)
+            ranked = [((product, w), v) for w, v in top.items()[:k]] if top else []
+        else:
+            ranked = self.top.items()[:k]
+        return [{"product": p, "top_wholesaler": w, "purchases": v} for (p, w), v in ranked]
+
+
+def event_time(record: Dict) -> float:
+    """Epoch seconds of a record's ``timestamp``, or now when it has none."""
+    ts = record.get("timestamp")
+    if isinstance(ts, (int, float)):
+        return float(ts)
+    if ts:
+        try:
+            return datetime.fromisoformat(ts.replace("Z", "+00:00")).timestamp()
+        except ValueError:
+            pass
+    return time.time()
+
+
+class SearchTrends:
+    """Per-query search counts in ring buffers of per-minute buckets.
+
+    Each query keeps ``2 * window`` buckets: the current window and the
+    one before it, so its trend is an O(buckets) comparison of two sums.
+    The clock is the newest event ``timestamp`` seen (event time), which
+    keeps replayed or historical streams meaningful.
+    """
+
+    def __init__(self, window_minutes: int = 60):
+        self.window = window_minutes
+        self.reset()
+
+    def reset(self):
+        self._rings: Dict[str, List[int]] = {}
+        self._heads: Dict[str, int] = {}
+        self.now = 0
+
+    def on_record(self, record: Dict):
+        query = record.get("query", "Unknown")
+        minute = int(event_time(record) // 60)
+        if minute > self.now:
+            self.now = minute
+
+        span = 2 * self.window
+        ring = self._rings.get(query)
+        if ring is None:
+            ring = self._rings[query] = [0] * span
+            self._heads[query] = minute
+        head = self._heads[query]
+        if minute > head:
+            # Zero the buckets we skipped over since this query's last search
+            for m in range(max(head + 1, minute - span + 1), minute + 1):
+                ring[m % span] = 0
+            self._heads[query] = minute
+        elif minute <= head - span:
+            return  # older than anything we still keep
+        ring[minute % span] += 1
+
+    def window_counts(self, query: str) -> tuple:
+        """(current window, previous window) search counts for ``query``."""
+        ring, head = self._rings[query], self._heads[query]
+        span = 2 * self.window
+        current = previous = 0
+        for m in range(max(self.now - span + 1, head - span + 1), min(self.now, head) + 1):
+            if m > self.now - self.window:
+                current += ring[m % span]
+            else:
+                previous += ring[m % span]
+        return current, previous
+
+    def top(self, k: int = 5) -> List[Dict]:
+        rows = []
+        for query in self._rings:
+            current, previous = self.window_counts(query)
+            if current:
+                rows.append((current, previous, query))
+        rows = heapq.nlargest(k, rows)
+        return [
+            {"query": query, "searches": current, "trend": format_change(current, previous)}
+            for current, previous, query in rows
+        ]
+
+
+def format_change(current: int, previous: int) -> str:
+    if not previous:
+        return "+100%"
+    return f"{(current - previous) / previous * 100:+.0f}%"
@@ -4,9 +4,12 @@ from fastapi.middleware.cors import CORSMiddleware
 import google.generativeai as genai
 import uvicorn
 import os
+import asyncio
 import requests
 from dotenv import load_dotenv
 
+from reasoning_cache import ReasoningCache
+
 load_dotenv()
 if os.getenv("GEMINI_API_KEY"):
     genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
@@ -76,9 +79,16 @@ def get_best_wholesaler(product: str = "wheat"):
         ]
     }
 
+def generate_insight(prompt: str) -> str:
+    model = genai.GenerativeModel('gemini-2.5-flash')
+    return model.generate_content(prompt).text
+
+# Insights are reused for the same product and (rounded) weather for 15 minutes
+trade_brain_reasoning = ReasoningCache(generate_insight, budget=float(os.getenv("REASONING_BUDGET", "2.0")))
+
 @app.get("/api/trade-brain")
-def get_trade_brain_insights(product: str = "wheat"):
-    north_weather = get_live_weather_demand("Delhi")
+async def get_trade_brain_insights(product: str = "wheat"):
+    north_weather = await asyncio.to_thread(get_live_weather_demand, "Delhi")
     
     prompt = f"""
     Based on real-time Pathway streams via OpenWeatherMap:
@@ -89,12 +99,9 @@ def get_trade_brain_insights(product: str = "wheat"):
     
     Provide a short, 3-sentence trading insight predicting price movement, detecting unusual demand based on the weather, and advising buy/sell. Focus on sustainability.
     """
-    try:
-        model = genai.GenerativeModel('gemini-2.5-flash')
-        response = model.generate_content(prompt)
-        text = response.text
-    except Exception as e:
-        text = f"The live weather in the North is {north_weather['temp']}°C ({north_weather['condition']}). We advise buying now from EcoHarvest Organic to secure low-carbon, locally sourced grains before weather events drive up wholesale costs. This limits transportation emissions while resolving supply constraints."
+    fallback = f"The live weather in the North is {north_weather['temp']}°C ({north_weather['condition']}). We advise buying now from EcoHarvest Organic to secure low-carbon, locally sourced grains before weather events drive up wholesale costs. This limits transportation emissions while resolving supply constraints."
+    key = trade_brain_reasoning.key(product, "North", north_weather['temp'], north_weather['condition'], "EcoHarvest Organic")
+    text = await trade_brain_reasoning.explain(key, prompt, fallback)
         
     return {"insight": text}
 
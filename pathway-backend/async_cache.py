@@ -0,0 +1,99 @@
+"""
+Async TTL cache for slow upstream lookups (weather APIs and friends).
+
+- Fresh hits are served from memory.
+- Stale hits are served immediately while one background refresh runs.
+- Concurrent misses for the same key share a single upstream call.
+- Failures are remembered for ``error_ttl`` seconds so a down upstream is
+  not hammered; a stale value, if any, keeps being served meanwhile.
+- At most ``max_entries`` keys are kept, least recently used evicted first.
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Hashable, Optional
+
+
+class _Entry:
+    __slots__ = ("value", "error", "expires")
+
+    def __init__(self, value, error, expires):
+        self.value = value
+        self.error = error
+        self.expires = expires
+
+
+class AsyncTtlCache:
+    def __init__(
+        self,
+        loader: Optional[Callable[[Hashable], Awaitable]],
+        ttl: float,
+        error_ttl: float = 30.0,
+        max_entries: int = 1024,
+    ):
+        self.loader = loader
+        self.ttl = ttl
+        self.error_ttl = error_ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+
+    async def get(self, key: Hashable, timeout: Optional[float] = None,
+                  load: Optional[Callable[[], Awaitable]] = None):
+        """Cached value for ``key``; loads it on a miss.
+
+        ``load``, if given, is called instead of ``loader(key)`` for a load
+        this call starts (for keys that don't carry everything the load needs).
+
+        Raises the loader's exception (possibly a cached one) on a miss
+        that fails, and ``asyncio.TimeoutError`` when a miss takes longer
+        than ``timeout`` - the load keeps running and fills the cache.
+        """
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            if time.monotonic() >= entry.expires:
+                self._refresh(key, load)
+            if entry.error is None:
+                return entry.value
+            if time.monotonic() < entry.expires:
+                raise entry.error
+
+        return await asyncio.wait_for(asyncio.shield(self._refresh(key, load)), timeout)
+
+    def peek(self, key: Hashable):
+        """Last good value for ``key`` (fresh or stale), without loading."""
+        entry = self._entries.get(key)
+        return entry.value if entry is not None and entry.error is None else None
+
+    def _refresh(self, key: Hashable, load=None) -> asyncio.Future:
+        task = self._inflight.get(key)
+        if task is None:
+            task = self._inflight[key] = asyncio.ensure_future(self._load(key, load))
+            # Nobody may await a background refresh; don't warn about its exception
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        return task
+
+    async def _load(self, key: Hashable, load=None):
+        try:
+            value = await (load() if load is not None else self.loader(key))
+        except Exception as e:
+            entry = self._entries.get(key)
+            if entry is not None and entry.error is None:
+                # Keep serving the stale value, just retry later
+                entry.expires = time.monotonic() + self.error_ttl
+            else:
+                self._store(key, _Entry(None, e, time.monotonic() + self.error_ttl))
+            raise
+        else:
+            self._store(key, _Entry(value, None, time.monotonic() + self.ttl))
+            return value
+        finally:
+            self._inflight.pop(key, None)
+
+    def _store(self, key: Hashable, entry: _Entry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
@@ -0,0 +1,114 @@
+"""
+Server-Sent Events fan-out for live dashboard state.
+
+State is split into channels, each with a function building its current
+payload (a dict). Producers only mark a channel dirty with ``publish()``.
+Once per tick the broadcaster rebuilds the dirty channels, diffs them
+against what subscribers last got, and encodes one ``delta`` message with
+the changed fields. Every subscriber is woken through a single shared
+event and writes those same bytes, so the cost per tick does not depend
+on the number of connections.
+
+A subscriber first gets a ``snapshot`` of every channel. One that falls
+more than ``history`` messages behind gets a fresh snapshot instead of
+the deltas it missed.
+"""
+
+import asyncio
+from collections import deque
+from typing import AsyncIterator, Callable, Dict
+
+import orjson
+
+_MISSING = object()
+
+
+def _diff(old: Dict, new: Dict) -> Dict:
+    """Fields of ``new`` that differ from ``old``; removed fields map to None."""
+    if old is None:
+        return dict(new)
+    delta = {key: value for key, value in new.items() if old.get(key, _MISSING) != value}
+    delta.update({key: None for key in old if key not in new})
+    return delta
+
+
+def _event(name: str, data: Dict) -> bytes:
+    return b"event: " + name.encode() + b"\ndata: " + orjson.dumps(data) + b"\n\n"
+
+
+class Broadcaster:
+    def __init__(self, tick: float = 1.0, history: int = 64, heartbeat: float = 15.0):
+        self.tick = tick
+        self.heartbeat = heartbeat
+        self.seq = 0
+        self.subscribers = 0
+        self._sources: Dict[str, Callable[[], Dict]] = {}
+        self._state: Dict[str, Dict] = {}
+        self._dirty = set()
+        self._messages = deque(maxlen=history)
+        self._wakeup = asyncio.Event()
+
+    def source(self, channel: str, build: Callable[[], Dict]):
+        """Register ``build()`` as the payload of ``channel``."""
+        self._sources[channel] = build
+        self._dirty.add(channel)
+
+    def publish(self, channel: str):
+        """Mark ``channel`` changed; it is rebuilt and sent on the next tick."""
+        self._dirty.add(channel)
+
+    async def run(self):
+        """Background task flushing dirty channels once per tick."""
+        while True:
+            await asyncio.sleep(self.tick)
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Broadcast error: {e}")
+
+    def flush(self):
+        if not self._dirty:
+            return
+        dirty, self._dirty = self._dirty, set()
+        changes = {}
+        for channel in dirty:
+            payload = self._sources[channel]()
+            delta = _diff(self._state.get(channel), payload)
+            if delta:
+                changes[channel] = delta
+                self._state[channel] = payload
+        if not changes:
+            return
+
+        self.seq += 1
+        self._messages.append((self.seq, _event("delta", {"seq": self.seq, **changes})))
+        wakeup, self._wakeup = self._wakeup, asyncio.Event()
+        wakeup.set()
+
+    def _snapshot(self) -> bytes:
+        return _event("snapshot", {"seq": self.seq, **self._state})
+
+    async def subscribe(self) -> AsyncIterator[bytes]:
+        """SSE byte stream for one connection."""
+        self.subscribers += 1
+        try:
+            seen = self.seq
+            yield self._snapshot()
+            while True:
+                if self.seq == seen:
+                    try:
+                        await asyncio.wait_for(self._wakeup.wait(), self.heartbeat)
+                    except asyncio.TimeoutError:
+                        yield b": ping\n\n"
+                    continue
+
+                if not self._messages or self._messages[0][0] > seen + 1:
+                    # Missed deltas are gone from the history; start over
+                    seen = self.seq
+                    yield self._snapshot()
+                    continue
+                missed = [message for seq, message in self._messages if seq > seen]
+                seen = self.seq
+                yield b"".join(missed)
+        finally:
+            self.subscribers -= 1
@@ -0,0 +1,181 @@
+"""
+Columnar wholesaler catalog.
+
+Listings are stored as one NumPy structured array (40 bytes per listing)
+with the green score precomputed at ingest, and text fields interned into
+a shared string table. Filters, sorts and aggregates over the catalog are
+vectorized operations instead of Python loops over dicts.
+
+The catalog is a column index next to the listing dicts, not a
+replacement for them: the stream tail, the retrieval indexes and the
+aggregates still hold the dicts, and hits are returned from those with
+every field as ingested (``record()`` would give float32 numbers and
+only the columns above). It adds its 40 bytes per listing to the process.
+
+The catalog is a StreamStore view (rows follow ``listing_slot()``, so row
+numbers match the retrieval indexes) and can be written to disk as a
+memory-mappable snapshot for offline readers (``open()``; the servers
+build theirs from the stream):
+
+    python catalog.py data/wholesalers_stream.jsonl data/catalog
+"""
+
+import json
+import os
+import sys
+from typing import Dict, List
+
+import numpy as np
+
+from aggregates import green_score, listing_slot
+
+NUMERIC_FIELDS = ("price", "rating", "carbon_saved_kg", "waste_reduced_kg", "delivery_time_hrs")
+TEXT_FIELDS = ("wholesaler_id", "product_name", "description", "region")
+
+CATALOG_DTYPE = np.dtype(
+    [(name, np.float32) for name in NUMERIC_FIELDS]
+    + [("green_score", np.float32)]
+    + [(name, np.uint32) for name in TEXT_FIELDS]
+)
+
+
+def number(value) -> float:
+    """A numeric field as a float; missing or non-numeric values count as 0."""
+    try:
+        return float(value or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class ColumnarCatalog:
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.data = np.zeros(1024, dtype=CATALOG_DTYPE)
+        self.rows = 0
+        self.strings: List[str] = []
+        self._string_ids: Dict[str, int] = {}
+        self._slots: Dict = {}
+
+    def on_record(self, record: Dict):
+        row, is_new = listing_slot(self._slots, record)
+        if is_new:
+            self.rows += 1
+            if row == len(self.data):
+                grown = np.zeros(2 * len(self.data), dtype=CATALOG_DTYPE)
+                grown[:len(self.data)] = self.data
+                self.data = grown
+
+        # A malformed number must not fail the record (or the poll feeding every other view)
+        numbers = {name: number(record.get(name)) for name in NUMERIC_FIELDS}
+        values = tuple(numbers.values())
+        values += (green_score(numbers),)
+        values += tuple(self._intern(str(record.get(name, ""))) for name in TEXT_FIELDS)
+        self.data[row] = values
+
+    def _intern(self, text: str) -> int:
+        string_id = self._string_ids.get(text)
+        if string_id is None:
+            string_id = self._string_ids[text] = len(self.strings)
+            self.strings.append(text)
+        return string_id
+
+    @property
+    def columns(self) -> np.ndarray:
+        """The live rows; each field (``columns["price"]``...) is a vectorizable column."""
+        return self.data[:self.rows]
+
+    def mask(self, region: str = None, product_name: str = None, max_price: float = None,
+             min_rating: float = None, max_delivery_hrs: float = None) -> np.ndarray:
+        """Boolean row mask for the given filters (None means no constraint)."""
+        cols = self.columns
+        keep = np.ones(self.rows, dtype=bool)
+        for field, text in (("region", region), ("product_name", product_name)):
+            if text is not None:
+                string_id = self._string_ids.get(text)
+                if string_id is None:
+                    return np.zeros(self.rows, dtype=bool)
+                keep &= cols[field] == string_id
+        if max_price is not None:
+            keep &= cols["price"] <= max_price
+        if min_rating is not None:
+            keep &= cols["rating"] >= min_rating
+        if max_delivery_hrs is not None:
+            keep &= cols["delivery_time_hrs"] <= max_delivery_hrs
+        return keep
+
+    def top(self, field: str, k: int, mask: np.ndarray = None, descending: bool = True) -> np.ndarray:
+        """Row numbers of the ``k`` best rows by ``field`` (argpartition + sort of k)."""
+        values = self.columns[field].astype(np.float64)
+        if not descending:
+            values = -values
+        if mask is not None:
+            values[~mask] = -np.inf
+            k = min(k, int(mask.sum()))
+        k = min(k, self.rows)
+        if k <= 0:
+            return np.zeros(0, dtype=np.int64)
+        best = np.argpartition(-values, k - 1)[:k]
+        return best[np.argsort(-values[best], kind="stable")]
+
+    def totals(self, mask: np.ndarray = None) -> Dict:
+        cols = self.columns if mask is None else self.columns[mask]
+        return {
+            "total_carbon_saved": float(cols["carbon_saved_kg"].sum(dtype=np.float64)),
+            "total_waste_reduced": float(cols["waste_reduced_kg"].sum(dtype=np.float64)),
+            "total_green_score": float(cols["green_score"].sum(dtype=np.float64)),
+            "listings": int(len(cols)),
+        }
+
+    def record(self, row: int) -> Dict:
+        """Rebuild a listing dict from its row."""
+        values = self.data[row]
+        record = {name: values[name].item() for name in NUMERIC_FIELDS}
+        record.update({name: self.strings[values[name]] for name in TEXT_FIELDS})
+        return record
+
+    def write(self, directory: str):
+        """Write ``catalog.npy`` and ``strings.json`` for ``ColumnarCatalog.open()``.
+
+        The string table is append-only, so it is replaced first: a reader
+        pairing it with the previous ``catalog.npy`` still resolves every id.
+        """
+        os.makedirs(directory, exist_ok=True)
+        strings_path = os.path.join(directory, "strings.json")
+        with open(strings_path + ".tmp", "w") as f:
+            json.dump(self.strings, f)
+        os.replace(strings_path + ".tmp", strings_path)
+
+        data_path = os.path.join(directory, "catalog.npy")
+        out = np.lib.format.open_memmap(data_path + ".tmp.npy", mode="w+", dtype=CATALOG_DTYPE, shape=(self.rows,))
+        out[:] = self.columns
+        out.flush()
+        del out
+        os.replace(data_path + ".tmp.npy", data_path)
+
+    @classmethod
+    def open(cls, directory: str) -> "ColumnarCatalog":
+        """Read-only catalog memory-mapped from a ``write()`` snapshot."""
+        catalog = cls()
+        with open(os.path.join(directory, "strings.json")) as f:
+            catalog.strings = json.load(f)
+        catalog._string_ids = {text: i for i, text in enumerate(catalog.strings)}
+        catalog.data = np.load(os.path.join(directory, "catalog.npy"), mmap_mode="r")
+        catalog.rows = len(catalog.data)
+        return catalog
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print("usage: python catalog.py <wholesalers_stream.jsonl> <output_dir>")
+        raise SystemExit(1)
+
+    from stream_store import JsonlTail
+
+    tail = JsonlTail(sys.argv[1])
+    catalog = tail.subscribe(ColumnarCatalog())
+    tail.poll()
+    catalog.write(sys.argv[2])
+    print(f"Wrote {catalog.rows} listings ({catalog.columns.nbytes} bytes of columns, "
+          f"{len(catalog.strings)} strings) to {sys.argv[2]}")
@@ -0,0 +1,71 @@
+"""
+Festival calendar shared by the real-time servers.
+
+Festivals and their dates (one per year) live in data/festivals.json. All
+occurrences are kept in one date-sorted array, so a date range is two
+bisects, and the per-day "upcoming festivals" answer is memoized.
+
+The dates are not computed (most follow the lunar calendar), so the file
+has to be extended as years pass. Ranges past its last year print a
+warning once instead of quietly coming back empty.
+"""
+
+import json
+from bisect import bisect_left, bisect_right
+from datetime import date, timedelta
+from functools import lru_cache
+from typing import Dict, List
+
+FESTIVALS_FILE = "data/festivals.json"
+
+
+class FestivalCalendar:
+    def __init__(self, festivals: List[Dict]):
+        occurrences = []
+        for festival in festivals:
+            info = {key: value for key, value in festival.items() if key != "dates"}
+            for day in festival["dates"]:
+                occurrences.append((date.fromisoformat(day), info))
+        occurrences.sort(key=lambda occurrence: occurrence[0])
+        # The last year with any dates is taken to be complete
+        self.covered_until = date(occurrences[-1][0].year, 12, 31) if occurrences else date.min
+        self._warned = False
+        self._days = [day.toordinal() for day, _ in occurrences]
+        self._occurrences = occurrences
+        self.upcoming = lru_cache(maxsize=64)(self._upcoming)
+
+    @classmethod
+    def load(cls, path: str = FESTIVALS_FILE) -> "FestivalCalendar":
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def between(self, start: date, end: date, region: str = None) -> List[tuple]:
+        """``(date, festival)`` pairs from ``start`` to ``end`` inclusive, in date order."""
+        if end > self.covered_until and not self._warned:
+            self._warned = True
+            print(f"Festival calendar warning: {FESTIVALS_FILE} has dates up to {self.covered_until.year} only; "
+                  f"add the dates of later years")
+        lo = bisect_left(self._days, start.toordinal())
+        hi = bisect_right(self._days, end.toordinal())
+        return [
+            (day, festival) for day, festival in self._occurrences[lo:hi]
+            if region is None or region in festival.get("regions", []) or "All" in festival.get("regions", [])
+        ]
+
+    def _upcoming(self, today: date, region: str = None, past_days: int = 7,
+                  ahead_days: int = 60, limit: int = 3) -> List[Dict]:
+        """Festivals from ``past_days`` ago to ``ahead_days`` ahead of ``today``.
+
+        Memoized per argument tuple (see ``self.upcoming``); callers must not
+        mutate the result.
+        """
+        upcoming = []
+        for day, festival in self.between(today - timedelta(days=past_days), today + timedelta(days=ahead_days), region):
+            days_until = (day - today).days
+            upcoming.append({
+                **festival,
+                "date": day.isoformat(),
+                "days_until": days_until,
+                "status": "ongoing" if days_until <= 0 else "upcoming",
+            })
+        return upcoming[:limit]
@@ -1,5 +1,7 @@
-import json
+import argparse
+import multiprocessing
 import os
+import httpx
 import uvicorn
 from starlette.applications import Starlette
 from starlette.responses import JSONResponse
@@ -7,173 +9,320 @@ from starlette.routing import Route
 import threading
 import time
 from starlette.middleware.cors import CORSMiddleware
-from collections import Counter
+from stream_store import store
+from async_cache import AsyncTtlCache
+from aggregates import PurchaseLeaderboard, SearchTrends, WholesalerAggregates, green_score
+from retrieval import Bm25Index, VectorIndex
+from catalog import ColumnarCatalog
 
 DATA_FILE = "data/wholesalers_stream.jsonl"
 WEATHER_FILE = "data/weather_stream.jsonl"
 SEARCH_FILE = "data/searches_stream.jsonl"
 PURCHASE_FILE = "data/purchases_stream.jsonl"
 
-def read_jsonl(filepath):
-    if not os.path.exists(filepath):
-        # Create if doesn't exist to avoid errors
-        with open(filepath, 'w') as f:
-            pass
-        return []
-    records = []
-    with open(filepath, "r") as f:
-        for line in f:
-            if line.strip():
-                try:
-                    records.append(json.loads(line))
-                except:
-                    pass
-    return records
+# "keyword" (BM25) or "vector" (hashed n-gram TF-IDF cosine); requests may override with "mode"
+RETRIEVE_MODE = os.getenv("RETRIEVE_MODE", "keyword")
+# Optional .npy file to warm-start the vector index from (saved again on shutdown)
+EMBEDDINGS_FILE = os.getenv("RETRIEVE_EMBEDDINGS")
+
+# Multi-worker mode: the parent process tails the streams and publishes a snapshot here
+# whenever they changed; workers serve from the newest one and never read the streams
+SNAPSHOT_DIR = os.getenv("MOCK_PATHWAY_SNAPSHOT_DIR", "data/.snapshot")
+SNAPSHOT_INTERVAL = 5
+WORKER = bool(os.getenv("MOCK_PATHWAY_WORKER"))
+
+def load_views():
+    # (Re)bind the views to the tails in the store, e.g. after loading a snapshot
+    global catalog, wholesaler_stats, keyword_index, vector_index, purchase_leaders, search_trends
+    catalog = store.tail(DATA_FILE).view("catalog", ColumnarCatalog)
+    wholesaler_stats = store.tail(DATA_FILE).view("wholesaler_stats", WholesalerAggregates)
+    keyword_index = store.tail(DATA_FILE).view("keyword_index", Bm25Index)
+    vector_index = store.tail(DATA_FILE).view("vector_index", lambda: VectorIndex(path=EMBEDDINGS_FILE))
+    purchase_leaders = store.tail(PURCHASE_FILE).view("purchase_leaders", PurchaseLeaderboard)
+    search_trends = store.tail(SEARCH_FILE).view("search_trends", SearchTrends)
+
+if WORKER:
+    store.load_snapshot(SNAPSHOT_DIR)
+load_views()
+
+def sync(path):
+    """The tail of ``path``, with it and its views up to date.
+
+    A worker switches to the parent's newest snapshot when CURRENT has
+    moved; a single process polls the stream file itself.
+    """
+    if WORKER:
+        if store.refresh_snapshot(SNAPSHOT_DIR):
+            load_views()
+        return store.tail(path)
+    tail = store.tail(path)
+    tail.poll()
+    return tail
 
 async def get_global_stats(request):
-    records = read_jsonl(DATA_FILE)
-    total_carbon = 0
-    total_waste = 0
-    total_green = 0
-    for r in records:
-        c = r.get("carbon_saved_kg", 0)
-        w = r.get("waste_reduced_kg", 0)
-        total_carbon += c
-        total_waste += w
-        total_green += (c * 1.5) + (w * 2.0)
+    # Optional ?region=&product_name=&max_price=&min_rating=&max_delivery_hrs= filters
+    params = request.query_params
+    try:
+        filters = parse_filters({name: params.get(name) for name in CATALOG_FILTERS})
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
     
-    return JSONResponse([{
-        "total_carbon_saved": total_carbon,
-        "total_waste_reduced": total_waste,
-        "total_green_score": total_green
-    }])
+    tail = sync(DATA_FILE)
+    with tail.reading():
+        mask = catalog_mask(filters)
+        if mask is not None:
+            totals = catalog.totals(mask)
+            del totals["listings"]
+            return JSONResponse([totals])
+        
+        totals = wholesaler_stats.totals
+        return JSONResponse([{
+            "total_carbon_saved": totals.carbon,
+            "total_waste_reduced": totals.waste,
+            "total_green_score": totals.green
+        }])
+
+async def get_region_stats(request):
+    tail = sync(DATA_FILE)
+    with tail.reading():
+        return JSONResponse(wholesaler_stats.breakdown("region"))
+
+async def get_product_stats(request):
+    tail = sync(DATA_FILE)
+    with tail.reading():
+        return JSONResponse(wholesaler_stats.breakdown("product_name"))
 
 async def get_top_wholesalers(request):
     # Returns top wholesalers per product based on purchases
-    records = read_jsonl(PURCHASE_FILE)
-    if not records:
+    # Optional ?product=...&window=1h|1d&k=5
+    if not sync(PURCHASE_FILE).records:
         return JSONResponse([
             {"product": "Organic Wheat", "top_wholesaler": "EcoFarms Punjab", "purchases": 120},
             {"product": "Jute Bags", "top_wholesaler": "Bengal Jute Co.", "purchases": 85}
         ])
     
-    counts = {}
-    for r in records:
-        prod = r.get("product_name", "Unknown")
-        ws = r.get("wholesaler_name", "Unknown")
-        key = (prod, ws)
-        counts[key] = counts.get(key, 0) + r.get("quantity", 1)
-    
-    # Sort and format
-    sorted_counts = sorted(counts.items(), key=lambda x: x[1], reverse=True)[:5]
-    res = [{"product": k[0], "top_wholesaler": k[1], "purchases": v} for k, v in sorted_counts]
-    return JSONResponse(res)
+    params = request.query_params
+    window = params.get("window")
+    if window is not None and window not in purchase_leaders.windows:
+        return JSONResponse({"error": f"window must be one of {sorted(purchase_leaders.windows)}"}, status_code=400)
+    try:
+        k = min(positive_int(params.get("k", 5)), purchase_leaders.k)
+    except ValueError:
+        return JSONResponse({"error": "k must be a positive integer"}, status_code=400)
+    return JSONResponse(purchase_leaders.leaders(k, product=params.get("product"), window=window))
 
-async def get_seasonal_trends(request):
-    import urllib.request
-    
-    # Coordinates: Delhi, Mumbai, Punjab(Chandigarh)
-    url = "https://api.open-meteo.com/v1/forecast?latitude=28.61,19.07,30.73&longitude=77.20,72.87,76.78&current_weather=true"
+# Coordinates: Delhi, Mumbai, Punjab(Chandigarh)
+OPEN_METEO_URL = "https://api.open-meteo.com/v1/forecast?latitude=28.61,19.07,30.73&longitude=77.20,72.87,76.78&current_weather=true"
+SEASONAL_TTL = 600  # Open-Meteo refreshes current weather every 15 minutes
+SEASONAL_MISS_BUDGET = 2.0  # longest a request waits on a cold cache before using fallbacks
+
+FALLBACK_SEASONAL = [
+    {"region": "Delhi NCR", "weather": "Sunny (32°C)", "festival": "Upcoming: Holi", "trending": "Cooling Systems & Cottons"},
+    {"region": "Mumbai", "weather": "Humid (29°C)", "festival": "None", "trending": "Everyday Organics & Essentials"},
+    {"region": "Punjab", "weather": "Clear (25°C)", "festival": "Spring Prep", "trending": "Everyday Organics & Essentials"}
+]
+
+def decode_wmo(code):
+    if code == 0: return "Clear sky"
+    if code in [1, 2, 3]: return "Partly cloudy"
+    if code in [45, 48]: return "Fog"
+    if code in [51, 53, 55, 56, 57]: return "Drizzle"
+    if code in [61, 63, 65, 66, 67, 80, 81, 82]: return "Rain"
+    if code in [71, 73, 75, 77, 85, 86]: return "Snow"
+    if code in [95, 96, 99]: return "Thunderstorm"
+    return "Clear"
     
-    def decode_wmo(code):
-        if code == 0: return "Clear sky"
-        if code in [1, 2, 3]: return "Partly cloudy"
-        if code in [45, 48]: return "Fog"
-        if code in [51, 53, 55, 56, 57]: return "Drizzle"
-        if code in [61, 63, 65, 66, 67, 80, 81, 82]: return "Rain"
-        if code in [71, 73, 75, 77, 85, 86]: return "Snow"
-        if code in [95, 96, 99]: return "Thunderstorm"
-        return "Clear"
-        
-    def get_trend_for_weather(desc, temp):
-        if temp >= 32: return "Cooling Systems & Cottons"
-        elif "Rain" in desc or "Drizzle" in desc or "Thunderstorm" in desc: return "Umbrellas & Waterproof Tarps"
-        elif temp < 15: return "Winter Blankets & Heaters"
-        return "Everyday Organics & Essentials"
+def get_trend_for_weather(desc, temp):
+    if temp >= 32: return "Cooling Systems & Cottons"
+    elif "Rain" in desc or "Drizzle" in desc or "Thunderstorm" in desc: return "Umbrellas & Waterproof Tarps"
+    elif temp < 15: return "Winter Blankets & Heaters"
+    return "Everyday Organics & Essentials"
+
+_http_client = None
+
+def http_client():
+    # One pooled client for the 8081 event loop, created lazily inside it
+    global _http_client
+    if _http_client is None:
+        _http_client = httpx.AsyncClient(timeout=5.0, headers={'User-Agent': 'Mozilla/5.0'})
+    return _http_client
+
+async def fetch_seasonal(_key):
+    response = await http_client().get(OPEN_METEO_URL)
+    response.raise_for_status()
+    data = response.json()
     
+    rows = []
+    for template, location in zip(FALLBACK_SEASONAL, data):
+        w = location['current_weather']
+        desc = decode_wmo(w['weathercode'])
+        rows.append({
+            **template,
+            "weather": f"{desc} ({w['temperature']}°C)",
+            "trending": get_trend_for_weather(desc, w['temperature'])
+        })
+    return rows
+
+seasonal_cache = AsyncTtlCache(fetch_seasonal, ttl=SEASONAL_TTL, error_ttl=60)
+
+async def get_seasonal_trends(request):
+    # Fresh or stale cached result; concurrent misses share one upstream call
     try:
-        req = urllib.request.Request(url, headers={'User-Agent': 'Mozilla/5.0'})
-        with urllib.request.urlopen(req, timeout=5) as response:
-            data = json.loads(response.read().decode())
-            
-        w_delhi = data[0]['current_weather']
-        w_mumbai = data[1]['current_weather']
-        w_punjab = data[2]['current_weather']
-        
-        weather_delhi = f"{decode_wmo(w_delhi['weathercode'])} ({w_delhi['temperature']}°C)"
-        weather_mumbai = f"{decode_wmo(w_mumbai['weathercode'])} ({w_mumbai['temperature']}°C)"
-        weather_punjab = f"{decode_wmo(w_punjab['weathercode'])} ({w_punjab['temperature']}°C)"
-        
-        trend_delhi = get_trend_for_weather(decode_wmo(w_delhi['weathercode']), w_delhi['temperature'])
-        trend_mumbai = get_trend_for_weather(decode_wmo(w_mumbai['weathercode']), w_mumbai['temperature'])
-        trend_punjab = get_trend_for_weather(decode_wmo(w_punjab['weathercode']), w_punjab['temperature'])
-        
-    except Exception as e:
-        weather_delhi = "Sunny (32°C)"
-        weather_mumbai = "Humid (29°C)"
-        weather_punjab = "Clear (25°C)"
-        trend_delhi = "Cooling Systems & Cottons"
-        trend_mumbai = "Everyday Organics & Essentials"
-        trend_punjab = "Everyday Organics & Essentials"
-        
-    return JSONResponse([
-        {"region": "Delhi NCR", "weather": weather_delhi, "festival": "Upcoming: Holi", "trending": trend_delhi},
-        {"region": "Mumbai", "weather": weather_mumbai, "festival": "None", "trending": trend_mumbai},
-        {"region": "Punjab", "weather": weather_punjab, "festival": "Spring Prep", "trending": trend_punjab}
-    ])
+        rows = await seasonal_cache.get("seasonal", timeout=SEASONAL_MISS_BUDGET)
+    except Exception:
+        rows = FALLBACK_SEASONAL
+    return JSONResponse(rows)
 
 async def get_search_trends(request):
-    records = read_jsonl(SEARCH_FILE)
-    if not records:
+    if not sync(SEARCH_FILE).records:
         return JSONResponse([
             {"query": "organic cotton", "searches": 450, "trend": "+12%"},
             {"quantity": "bamboo toothbrushes", "searches": 320, "trend": "+8%"}
         ])
-        
-    counts = Counter()
-    for r in records:
-        counts[r.get("query", "Unknown")] += 1
-        
-    res = [{"query": k, "searches": v * 10, "trend": "+15%"} for k, v in counts.most_common(5)]
-    return JSONResponse(res)
+    
+    # Searches in the last hour of the stream vs the hour before
+    return JSONResponse(search_trends.top(5))
+
+def format_hit(r):
+    gs = green_score(r)
+    text = f"Product: {r.get('product_name')} | Details: {r.get('description')} | Green Score: {gs} | Price: ${r.get('price')} | Rating: {r.get('rating')} | Wholesaler ID: {r.get('wholesaler_id')} | Region: {r.get('region')}"
+    return {"text": text, "metadata": r}
+
+CATALOG_FILTERS = ("region", "product_name", "max_price", "min_rating", "max_delivery_hrs")
+NUMERIC_FILTERS = ("max_price", "min_rating", "max_delivery_hrs")
+
+def parse_filters(filters):
+    """``filters`` checked against CATALOG_FILTERS, numbers as floats and unset ones dropped.
+
+    Raises ValueError with the message to return to the client.
+    """
+    if not isinstance(filters, dict):
+        raise ValueError("filters must be an object")
+    for name in filters:
+        if name not in CATALOG_FILTERS:
+            raise ValueError(f"unknown filter {name!r}, expected one of {', '.join(CATALOG_FILTERS)}")
+    parsed = {}
+    for name, value in filters.items():
+        if value is None:
+            continue
+        if name in NUMERIC_FILTERS:
+            try:
+                if isinstance(value, bool):
+                    raise TypeError
+                value = float(value)
+            except (TypeError, ValueError):
+                raise ValueError(f"{name} must be a number")
+        elif not isinstance(value, str):
+            raise ValueError(f"{name} must be a string")
+        parsed[name] = value
+    return parsed
+
+def catalog_mask(filters):
+    # Vectorized filter over the columnar catalog (filters from parse_filters); its rows line up with the index slots
+    return catalog.mask(**filters) if filters else None
+
+def positive_int(value):
+    """``value`` (an int or numeric string) as an int >= 1; raises ValueError otherwise."""
+    if isinstance(value, bool) or (isinstance(value, float) and not value.is_integer()):
+        raise ValueError(f"expected a positive integer, got {value!r}")
+    number = int(value)
+    if number < 1:
+        raise ValueError(f"expected a positive integer, got {value!r}")
+    return number
+
+def search(queries, mode, filters=None):
+    """Run (query, k) pairs through the selected index in one batch, preserving order.
+
+    Syncs the wholesalers stream first and searches under the tail's lock,
+    as the 8081 server polls (and so updates the indexes) from another thread.
+    """
+    tail = sync(DATA_FILE)
+    with tail.reading():
+        return [[format_hit(r) for r in hits] for hits in _search(queries, mode, filters)]
+
+def _search(queries, mode, filters):
+    mask = catalog_mask(filters)
+    padding = None
+    if mask is not None:
+        # Pad short keyword results with the greenest listings that pass the filters
+        depth = max((k for _, k in queries), default=0)
+        padding = [int(row) for row in catalog.top("green_score", depth, mask)]
+    if mode != "vector":
+        return keyword_index.search_batch(queries, mask, padding)
+    # Empty queries have no n-grams to embed; rank those by BM25 padding (greenest first)
+    vector_at = [i for i, (query, _) in enumerate(queries) if query]
+    results = keyword_index.search_batch([q for q in queries if not q[0]], mask, padding)[::-1]
+    vector_results = iter(vector_index.search_batch([queries[i] for i in vector_at], mask))
+    vector_at = set(vector_at)
+    return [next(vector_results) if i in vector_at else results.pop() for i in range(len(queries))]
 
 async def retrieve(request):
     try:
         body = await request.json()
         query = body.get("query", "")
+        k = body.get("k", 5)
+        mode = body.get("mode", RETRIEVE_MODE)
+        filters = body.get("filters") or {}
     except:
         query = ""
+        k = 5
+        mode = RETRIEVE_MODE
+        filters = {}
+    try:
+        k = positive_int(k)
+    except (TypeError, ValueError):
+        return JSONResponse({"error": "k must be a positive integer"}, status_code=400)
+    try:
+        filters = parse_filters(filters)
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
     
-    records = read_jsonl(DATA_FILE)
-    
-    # Very basic TF-IDF mock logic for local python fallback
-    query_words = set(query.lower().split()) if query else set()
-    
-    def score_record(r):
-        text_content = f"{r.get('product_name', '')} {r.get('description', '')}".lower()
-        match_score = sum(1 for w in query_words if w in text_content)
-        green_score = (r.get("carbon_saved_kg", 0) * 1.5) + (r.get("waste_reduced_kg", 0) * 2.0)
-        return (match_score, green_score) # Sort by exact text match first, then by green score
-        
-    records.sort(key=score_record, reverse=True)
-    
-    results = []
-    for r in records[:5]: # Return top 5 matches
-        gs = (r.get("carbon_saved_kg", 0) * 1.5) + (r.get("waste_reduced_kg", 0) * 2.0)
-        text = f"Product: {r.get('product_name')} | Details: {r.get('description')} | Green Score: {gs} | Price: ${r.get('price')} | Rating: {r.get('rating')} | Wholesaler ID: {r.get('wholesaler_id')} | Region: {r.get('region')}"
-        results.append({"text": text, "metadata": r})
+    # BM25 over the inverted index (ties broken by green score) or cosine over the embedding matrix
+    return JSONResponse(search([(query or "", k)], mode, filters)[0])
+
+async def retrieve_batch(request):
+    # {"queries": [{"query": "...", "k": 3}, "plain query", ...], "k": 5, "mode": "keyword", "filters": {...}}
+    try:
+        body = await request.json()
+        mode = body.get("mode", RETRIEVE_MODE)
+        filters = body.get("filters") or {}
+        raw_queries = body.get("queries", [])
+        default_k = body.get("k", 5)
+    except:
+        return JSONResponse({"error": "expected {\"queries\": [...]}"}, status_code=400)
+    if not isinstance(raw_queries, list):
+        return JSONResponse({"error": "queries must be a list"}, status_code=400)
+    try:
+        default_k = positive_int(default_k)
+        queries = []
+        for q in raw_queries:
+            if isinstance(q, dict):
+                queries.append((q.get("query") or "", positive_int(q.get("k", default_k))))
+            else:
+                queries.append((str(q), default_k))
+    except (TypeError, ValueError):
+        return JSONResponse({"error": "k must be a positive integer"}, status_code=400)
+    try:
+        filters = parse_filters(filters)
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
     
-    return JSONResponse(results)
+    return JSONResponse(search(queries, mode, filters))
 
 app8081 = Starlette(routes=[
     Route("/global-stats", get_global_stats),
+    Route("/global-stats/regions", get_region_stats),
+    Route("/global-stats/products", get_product_stats),
     Route("/top-wholesalers", get_top_wholesalers),
     Route("/trending-seasonal", get_seasonal_trends),
     Route("/search-trends", get_search_trends)
 ])
 app8081.add_middleware(CORSMiddleware, allow_origins=["*"])
 
-app8080 = Starlette(routes=[Route("/v1/retrieve", retrieve, methods=["POST"])])
+app8080 = Starlette(routes=[
+    Route("/v1/retrieve", retrieve, methods=["POST"]),
+    Route("/v1/retrieve/batch", retrieve_batch, methods=["POST"])
+])
 app8080.add_middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"])
 
 def run_8080():
@@ -182,7 +331,49 @@ def run_8080():
 def run_8081():
     uvicorn.run(app8081, host="0.0.0.0", port=8081, log_level="warning")
 
+def serve_workers(app_path, port, workers):
+    os.environ["MOCK_PATHWAY_WORKER"] = "1"
+    uvicorn.run(app_path, host="0.0.0.0", port=port, workers=workers, log_level="warning")
+
+def run_workers(workers):
+    # Parse every stream once here and publish it; workers only ever load snapshots
+    for path in (DATA_FILE, SEARCH_FILE, PURCHASE_FILE):
+        store.tail(path)
+    store.poll_all()
+    store.save_snapshot(SNAPSHOT_DIR)
+    
+    servers = [
+        multiprocessing.Process(target=serve_workers, args=("mock_pathway:app8080", 8080, workers)),
+        multiprocessing.Process(target=serve_workers, args=("mock_pathway:app8081", 8081, workers))
+    ]
+    for p in servers:
+        p.start()
+    
+    print("=========================================================")
+    print(">>> PATHWAY SIMULATION ENGINE RUNNING (Multi-worker Mode)")
+    print(f"   - Vector RAG Embeddings Server: {workers} workers on port 8080")
+    print(f"   - Live Market Intelligence Server: {workers} workers on port 8081")
+    print(f"   - Stream snapshots published to {SNAPSHOT_DIR} (checked every {SNAPSHOT_INTERVAL}s)")
+    print("=========================================================")
+    try:
+        while True:
+            time.sleep(SNAPSHOT_INTERVAL)
+            if store.poll_all():
+                store.save_snapshot(SNAPSHOT_DIR)
+    except KeyboardInterrupt:
+        for p in servers:
+            p.join()
+        vector_index.save()
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mock Pathway servers")
+    parser.add_argument("--workers", type=int, default=1, help="worker processes per port")
+    args = parser.parse_args()
+    
+    if args.workers > 1:
+        run_workers(args.workers)
+        raise SystemExit
+    
     t1 = threading.Thread(target=run_8080, daemon=True)
     t2 = threading.Thread(target=run_8081, daemon=True)
     t1.start()
@@ -197,4 +388,4 @@ if __name__ == "__main__":
         while True:
             time.sleep(1)
     except KeyboardInterrupt:
-        pass
+        vector_index.save()
\ No newline at end of file
@@ -4,17 +4,31 @@ Hack for Green Bharat - Live Data Integration
 """
 
 import pathway as pw
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 import google.generativeai as genai
 import uvicorn
 import os
-import requests
+import httpx
 import json
-from datetime import datetime, timedelta
+import hashlib
+import orjson
+from datetime import date, datetime
 from dotenv import load_dotenv
 import asyncio
-from typing import Dict, List
+import heapq
+import threading
+import numpy as np
+from typing import Dict, List, Optional
+
+from async_cache import AsyncTtlCache
+from broadcast import Broadcaster
+from festivals import FestivalCalendar
+from ranking import LiveWholesalerRanking, WholesalerRanking
+from reasoning_cache import ReasoningCache
+from stream_store import store
+from trending import SHOWN_MIN_SCORE, DecayedTrending, RateBuckets, RingLog
 
 load_dotenv()
 
@@ -37,280 +51,327 @@ app.add_middleware(
 # PATHWAY STREAMING TABLES - Real-Time Data Ingestion
 # ============================================================================
 
+# Append-only JSONL streams the engine tails (see data/)
+STREAM_DIR = os.getenv("PATHWAY_STREAM_DIR", "data")
+
 class WeatherSchema(pw.Schema):
-    city: str
-    temp: float
-    condition: str
-    demand_multiplier: float
-    timestamp: str
+    region: str = pw.column_definition(primary_key=True)
+    weather: str
+    festival: str
+    trending: str
 
 class WholesalerSchema(pw.Schema):
-    id: str
-    name: str
-    product: str
+    wholesaler_id: str = pw.column_definition(primary_key=True)
+    product_name: str
     price: float
     rating: float
-    green_score: float
-    carbon_saved_kg: int
-    local_sourcing_pct: int
-    delivery_hours: int
+    carbon_saved_kg: float
+    waste_reduced_kg: float
+    delivery_time_hrs: float
+    description: str
+    region: str
 
 class PurchaseSchema(pw.Schema):
-    product: str
-    wholesaler: str
+    wholesaler_name: str
+    product_name: str
     quantity: int
-    timestamp: str
+    buyer_id: str
 
 class SearchSchema(pw.Schema):
-    product: str
+    query: str
     region: str
     timestamp: str
-    count: int
+
+class PathwayOutput:
+    """Current rows of a Pathway table, maintained from its change stream.
+    
+    Registered with pw.io.subscribe, so it only ever applies deltas. An
+    update arrives as a retraction plus an addition for the same key, in
+    either order. With ``index_by``, rows can also be looked up by the
+    value of that (unique) column.
+    """
+    
+    def __init__(self, index_by: str = None):
+        self.rows: Dict = {}
+        self.index_by = index_by
+        self.by_value: Dict = {}
+        self.version = 0
+        self._lock = threading.Lock()
+    
+    def on_change(self, key, row: Dict, time: int, is_addition: bool):
+        with self._lock:
+            current = self.rows.get(key)
+            if is_addition:
+                self.rows[key] = row
+                if self.index_by is not None:
+                    self.by_value[row[self.index_by]] = row
+            elif current == row:
+                del self.rows[key]
+                if self.index_by is not None and self.by_value.get(row[self.index_by]) == row:
+                    del self.by_value[row[self.index_by]]
+            self.version += 1
+    
+    def values(self) -> List[Dict]:
+        with self._lock:
+            return list(self.rows.values())
+    
+    def items(self) -> List[tuple]:
+        with self._lock:
+            return list(self.rows.items())
+    
+    def lookup(self, value) -> Optional[Dict]:
+        """The row whose ``index_by`` column equals ``value``, if any."""
+        with self._lock:
+            return self.by_value.get(value)
+
+# Incrementally maintained outputs read by the endpoints
+pathway_stats = PathwayOutput()
+pathway_top_wholesalers = PathwayOutput()
+pathway_search_counts = PathwayOutput(index_by="query")
+pathway_regional_weather = PathwayOutput()
+
+def build_pathway_pipeline():
+    """Streaming connectors over the JSONL files and the aggregations on top"""
+    wholesalers = pw.io.jsonlines.read(
+        os.path.join(STREAM_DIR, "wholesalers_stream.jsonl"), schema=WholesalerSchema, mode="streaming"
+    )
+    purchases = pw.io.jsonlines.read(
+        os.path.join(STREAM_DIR, "purchases_stream.jsonl"), schema=PurchaseSchema, mode="streaming"
+    )
+    searches = pw.io.jsonlines.read(
+        os.path.join(STREAM_DIR, "searches_stream.jsonl"), schema=SearchSchema, mode="streaming"
+    )
+    regional_weather = pw.io.jsonlines.read(
+        os.path.join(STREAM_DIR, "weather_stream.jsonl"), schema=WeatherSchema, mode="streaming"
+    )
+    
+    # Sustainability totals over the latest listing per wholesaler
+    stats = wholesalers.reduce(
+        total_carbon_saved=pw.reducers.sum(pw.this.carbon_saved_kg),
+        total_waste_reduced=pw.reducers.sum(pw.this.waste_reduced_kg),
+        total_green_score=pw.reducers.sum(pw.this.carbon_saved_kg * 1.5 + pw.this.waste_reduced_kg * 2.0),
+        listings=pw.reducers.count()
+    )
+    
+    # Most purchased wholesaler per product
+    pair_totals = purchases.groupby(pw.this.product_name, pw.this.wholesaler_name).reduce(
+        pw.this.product_name,
+        pw.this.wholesaler_name,
+        purchases=pw.reducers.sum(pw.this.quantity)
+    )
+    best = pair_totals.groupby(pw.this.product_name).reduce(
+        pw.this.product_name,
+        best_pair=pw.reducers.argmax(pw.this.purchases),
+        purchases=pw.reducers.max(pw.this.purchases)
+    )
+    top_wholesalers = best.select(
+        product=pw.this.product_name,
+        top_wholesaler=pair_totals.ix(pw.this.best_pair).wholesaler_name,
+        purchases=pw.this.purchases
+    )
+    
+    # Search counts per query
+    search_counts = searches.groupby(pw.this.query).reduce(
+        pw.this.query,
+        searches=pw.reducers.count(),
+        last_search=pw.reducers.max(pw.this.timestamp)
+    )
+    
+    pw.io.subscribe(stats, on_change=pathway_stats.on_change)
+    pw.io.subscribe(top_wholesalers, on_change=pathway_top_wholesalers.on_change)
+    pw.io.subscribe(search_counts, on_change=pathway_search_counts.on_change)
+    pw.io.subscribe(regional_weather, on_change=pathway_regional_weather.on_change)
+
+def run_pathway_pipeline():
+    """Build the dataflow and run the engine (blocking; started on a thread).
+    
+    The engine uses PATHWAY_THREADS worker threads. Until it produces
+    output, endpoints serve their simulated data.
+    """
+    try:
+        build_pathway_pipeline()
+        pw.run(monitoring_level=pw.MonitoringLevel.NONE)
+    except Exception as e:
+        print(f"Pathway pipeline error: {e}")
 
 # ============================================================================
 # INDIAN FESTIVALS & SEASONAL EVENTS
 # ============================================================================
 
-def get_upcoming_festivals():
-    """Get upcoming Indian festivals and their product demand impact"""
-    today = datetime.now()
-    
-    # Major Indian festivals with dates (2026)
-    festivals = [
-        {
-            "name": "Holi",
-            "date": datetime(2026, 3, 14),
-            "products": ["Colors", "Sweets", "Beverages", "Organic Cotton"],
-            "demand_increase": 2.5,
-            "description": "Festival of Colors - High demand for organic colors and sweets"
-        },
-        {
-            "name": "Diwali",
-            "date": datetime(2026, 10, 19),
-            "products": ["Sweets", "Oils", "Decorations", "Electronics"],
-            "demand_increase": 3.0,
-            "description": "Festival of Lights - Peak demand for sweets and decorative items"
-        },
-        {
-            "name": "Eid",
-            "date": datetime(2026, 4, 3),
-            "products": ["Dates", "Spices", "Meat", "Fashion"],
-            "demand_increase": 2.2,
-            "description": "Eid celebrations - High demand for dates and traditional foods"
-        },
-        {
-            "name": "Raksha Bandhan",
-            "date": datetime(2026, 8, 9),
-            "products": ["Sweets", "Gifts", "Fashion"],
-            "demand_increase": 1.8,
-            "description": "Brother-Sister festival - Increased demand for gifts and sweets"
-        },
-        {
-            "name": "Navratri",
-            "date": datetime(2026, 10, 8),
-            "products": ["Grains", "Pulses", "Spices", "Fashion"],
-            "demand_increase": 2.0,
-            "description": "9-day festival - High demand for fasting foods and traditional wear"
-        },
-        {
-            "name": "Pongal",
-            "date": datetime(2026, 1, 14),
-            "products": ["Rice", "Sugarcane", "Turmeric", "Pulses"],
-            "demand_increase": 2.3,
-            "description": "Harvest festival - Peak demand for rice and agricultural products"
-        }
-    ]
-    
-    # Filter upcoming festivals (within next 60 days)
-    upcoming = []
-    for festival in festivals:
-        days_until = (festival["date"] - today).days
-        if -7 <= days_until <= 60:  # Show if within 60 days or just passed (7 days ago)
-            festival["days_until"] = days_until
-            festival["status"] = "ongoing" if days_until <= 0 else "upcoming"
-            upcoming.append(festival)
-    
-    # Sort by date
-    upcoming.sort(key=lambda x: x["days_until"])
+festival_calendar = FestivalCalendar.load()
+
+def get_upcoming_festivals(region: str = None) -> List[Dict]:
+    """Get upcoming Indian festivals and their product demand impact
     
-    return upcoming[:3]  # Return top 3 upcoming
+    Festivals within the next 60 days or that started in the last 7, at
+    most 3, memoized per day. Don't mutate the result.
+    """
+    return festival_calendar.upcoming(date.today(), region)
 
 # ============================================================================
 # PRODUCT DEMAND PREDICTION BASED ON WEATHER
 # ============================================================================
 
+# Temperature bands: (t >= 15) + (t >= 20) + (t > 30) + (t > 35)
+TEMP_BANDS = ("cold", "cool", "mild", "warm", "hot")
+# Condition classes
+CONDITION_CLASSES = ("rain", "clear", "other")
+CONDITION_CLASS_OF = {"Rain": 0, "Drizzle": 0, "Thunderstorm": 0, "Clear": 1}
+
+# Demand rules, in priority order. Each applies to the listed temperature
+# bands and condition classes (None means any); a product keeps the
+# prediction of the first rule that names it and at most 4 are shown.
+DEMAND_RULES = [
+    {
+        # Cold Weather (< 15°C)
+        "bands": ["cold"],
+        "conditions": None,
+        "predictions": [
+            {"product": "Wheat", "reason": "Cold weather increases demand for wheat-based hot foods", "demand_change": "+35%", "trend": "up", "icon": "🌾"},
+            {"product": "Spices", "reason": "Hot spices in demand for warming foods", "demand_change": "+28%", "trend": "up", "icon": "🌶️"},
+            {"product": "Oils", "reason": "Cooking oils for hot meals increase", "demand_change": "+22%", "trend": "up", "icon": "🛢️"}
+        ]
+    },
+    {
+        # Hot Weather (> 35°C)
+        "bands": ["hot"],
+        "conditions": None,
+        "predictions": [
+            {"product": "Beverages", "reason": "Extreme heat drives beverage consumption", "demand_change": "+45%", "trend": "up", "icon": "☕"},
+            {"product": "Rice", "reason": "Light meals preferred in hot weather", "demand_change": "+25%", "trend": "up", "icon": "🍚"},
+            {"product": "Cooling Products", "reason": "Demand for cooling items rises", "demand_change": "+40%", "trend": "up", "icon": "❄️"}
+        ]
+    },
+    {
+        # Rainy Weather
+        "bands": None,
+        "conditions": ["rain"],
+        "predictions": [
+            {"product": "Pulses", "reason": "Rainy weather increases demand for comfort foods", "demand_change": "+38%", "trend": "up", "icon": "🫘"},
+            {"product": "Spices", "reason": "Hot spiced foods popular during rain", "demand_change": "+32%", "trend": "up", "icon": "🌶️"},
+            {"product": "Grains", "reason": "Storage buying increases before monsoon", "demand_change": "+30%", "trend": "up", "icon": "🌾"}
+        ]
+    },
+    {
+        # Clear/Normal Weather (20-30°C)
+        "bands": ["mild"],
+        "conditions": ["clear"],
+        "predictions": [
+            {"product": "Organic Cotton", "reason": "Good weather for cotton processing and trade", "demand_change": "+15%", "trend": "stable", "icon": "👕"},
+            {"product": "Fresh Produce", "reason": "Optimal conditions for fresh goods", "demand_change": "+12%", "trend": "stable", "icon": "🥬"}
+        ]
+    }
+]
+
+def compile_demand_rules(rules: List[Dict]) -> List[List[Dict]]:
+    """Flatten the rules into one prediction list per (band, condition class) cell.
+    
+    Cell ``band * len(CONDITION_CLASSES) + condition_class`` holds the
+    de-duplicated, capped predictions for that weather, so evaluating the
+    rules is a table lookup.
+    """
+    table = []
+    for band in TEMP_BANDS:
+        for condition_class in CONDITION_CLASSES:
+            seen = set()
+            cell = []
+            for rule in rules:
+                if rule["bands"] is not None and band not in rule["bands"]:
+                    continue
+                if rule["conditions"] is not None and condition_class not in rule["conditions"]:
+                    continue
+                for pred in rule["predictions"]:
+                    if pred["product"] not in seen:
+                        seen.add(pred["product"])
+                        cell.append(pred)
+            table.append(cell[:4])
+    return table
+
+DEMAND_TABLE = compile_demand_rules(DEMAND_RULES)
+
+def demand_cells(weathers: List[Dict]) -> np.ndarray:
+    """DEMAND_TABLE cell of every weather record, in one vectorized pass"""
+    temps = np.fromiter((w.get("temp", 25) for w in weathers), dtype=np.float64, count=len(weathers))
+    conditions = np.fromiter(
+        (CONDITION_CLASS_OF.get(w.get("condition", "Clear"), 2) for w in weathers),
+        dtype=np.int64, count=len(weathers)
+    )
+    bands = (temps >= 15).astype(np.int64) + (temps >= 20) + (temps > 30) + (temps > 35)
+    return bands * len(CONDITION_CLASSES) + conditions
+
+def predict_demand_batch(weathers: List[Dict]) -> List[List[Dict]]:
+    """predict_product_demand() for many cities at once"""
+    return [DEMAND_TABLE[cell] for cell in demand_cells(weathers)]
+
 def predict_product_demand(weather_data: Dict) -> List[Dict]:
-    """Predict which products will rise based on weather conditions"""
-    
-    temp = weather_data.get("temp", 25)
-    condition = weather_data.get("condition", "Clear")
-    city = weather_data.get("city", "Ludhiana")
-    
-    predictions = []
-    
-    # Cold Weather (< 15°C)
-    if temp < 15:
-        predictions.extend([
-            {
-                "product": "Wheat",
-                "reason": "Cold weather increases demand for wheat-based hot foods",
-                "demand_change": "+35%",
-                "trend": "up",
-                "icon": "🌾"
-            },
-            {
-                "product": "Spices",
-                "reason": "Hot spices in demand for warming foods",
-                "demand_change": "+28%",
-                "trend": "up",
-                "icon": "🌶️"
-            },
-            {
-                "product": "Oils",
-                "reason": "Cooking oils for hot meals increase",
-                "demand_change": "+22%",
-                "trend": "up",
-                "icon": "🛢️"
-            }
-        ])
-    
-    # Hot Weather (> 35°C)
-    elif temp > 35:
-        predictions.extend([
-            {
-                "product": "Beverages",
-                "reason": "Extreme heat drives beverage consumption",
-                "demand_change": "+45%",
-                "trend": "up",
-                "icon": "☕"
-            },
-            {
-                "product": "Rice",
-                "reason": "Light meals preferred in hot weather",
-                "demand_change": "+25%",
-                "trend": "up",
-                "icon": "🍚"
-            },
-            {
-                "product": "Cooling Products",
-                "reason": "Demand for cooling items rises",
-                "demand_change": "+40%",
-                "trend": "up",
-                "icon": "❄️"
-            }
-        ])
-    
-    # Rainy Weather
-    if condition in ["Rain", "Drizzle", "Thunderstorm"]:
-        predictions.extend([
-            {
-                "product": "Pulses",
-                "reason": "Rainy weather increases demand for comfort foods",
-                "demand_change": "+38%",
-                "trend": "up",
-                "icon": "🫘"
-            },
-            {
-                "product": "Spices",
-                "reason": "Hot spiced foods popular during rain",
-                "demand_change": "+32%",
-                "trend": "up",
-                "icon": "🌶️"
-            },
-            {
-                "product": "Grains",
-                "reason": "Storage buying increases before monsoon",
-                "demand_change": "+30%",
-                "trend": "up",
-                "icon": "🌾"
-            }
-        ])
-    
-    # Clear/Normal Weather
-    elif condition == "Clear" and 20 <= temp <= 30:
-        predictions.extend([
-            {
-                "product": "Organic Cotton",
-                "reason": "Good weather for cotton processing and trade",
-                "demand_change": "+15%",
-                "trend": "stable",
-                "icon": "👕"
-            },
-            {
-                "product": "Fresh Produce",
-                "reason": "Optimal conditions for fresh goods",
-                "demand_change": "+12%",
-                "trend": "stable",
-                "icon": "🥬"
-            }
-        ])
-    
-    # Remove duplicates and limit to top 4
-    seen = set()
-    unique_predictions = []
-    for pred in predictions:
-        if pred["product"] not in seen:
-            seen.add(pred["product"])
-            unique_predictions.append(pred)
-    
-    return unique_predictions[:4]
+    """Predict which products will rise based on weather conditions
+    
+    The returned predictions are shared table entries; don't mutate them.
+    """
+    return predict_demand_batch([weather_data])[0]
 
 # ============================================================================
 # LIVE WEATHER DATA FETCHER
 # ============================================================================
 
-def fetch_live_weather(city: str) -> Dict:
-    """Fetch real-time weather from OpenWeatherMap API"""
+WEATHER_URL = "http://api.openweathermap.org/data/2.5/weather"
+
+# Per-city and whole-refresh budgets for the background weather loop
+WEATHER_CITY_TIMEOUT = 5.0
+WEATHER_REFRESH_DEADLINE = 8.0
+
+def _fallback_weather(city: str) -> Dict:
+    return {
+        "city": city,
+        "temp": 25.0,
+        "condition": "Clear",
+        "demand_multiplier": 1.0,
+        "timestamp": datetime.now().isoformat(),
+        "humidity": 60,
+        "wind_speed": 5.5
+    }
+
+def _parse_weather(city: str, data: Dict) -> Dict:
+    """Turn an OpenWeatherMap response into our weather record"""
+    temp = data['main']['temp']
+    condition = data['weather'][0]['main']
+    humidity = data['main']['humidity']
+    wind_speed = data['wind']['speed']
+    
+    # Calculate demand multiplier based on weather
+    multiplier = 1.0
+    if temp < 10 or condition in ["Snow", "Rain", "Thunderstorm"]:
+        multiplier = 1.6  # High demand during bad weather
+    elif temp > 35:
+        multiplier = 1.3  # Increased demand during extreme heat
+    elif condition == "Clear" and 20 <= temp <= 30:
+        multiplier = 0.9  # Normal/lower demand in good weather
+        
+    return {
+        "city": city,
+        "temp": round(temp, 1),
+        "condition": condition,
+        "demand_multiplier": round(multiplier, 2),
+        "timestamp": datetime.now().isoformat(),
+        "humidity": humidity,
+        "wind_speed": round(wind_speed, 1)
+    }
+
+# Shared connection pool for async upstream calls (opened on startup)
+http_client: httpx.AsyncClient = None
+
+async def fetch_live_weather(city: str) -> Dict:
+    """Fetch real-time weather from OpenWeatherMap API; raises on upstream errors"""
     if not OPENWEATHER_API_KEY:
-        return {
-            "city": city,
-            "temp": 25.0,
-            "condition": "Clear",
-            "demand_multiplier": 1.0,
-            "timestamp": datetime.now().isoformat(),
-            "humidity": 60,
-            "wind_speed": 5.5
-        }
+        return _fallback_weather(city)
     
-    url = f"http://api.openweathermap.org/data/2.5/weather?q={city}&appid={OPENWEATHER_API_KEY}&units=metric"
-    try:
-        response = requests.get(url, timeout=5)
-        data = response.json()
-        
-        temp = data['main']['temp']
-        condition = data['weather'][0]['main']
-        humidity = data['main']['humidity']
-        wind_speed = data['wind']['speed']
-        
-        # Calculate demand multiplier based on weather
-        multiplier = 1.0
-        if temp < 10 or condition in ["Snow", "Rain", "Thunderstorm"]:
-            multiplier = 1.6  # High demand during bad weather
-        elif temp > 35:
-            multiplier = 1.3  # Increased demand during extreme heat
-        elif condition == "Clear" and 20 <= temp <= 30:
-            multiplier = 0.9  # Normal/lower demand in good weather
-            
-        return {
-            "city": city,
-            "temp": round(temp, 1),
-            "condition": condition,
-            "demand_multiplier": round(multiplier, 2),
-            "timestamp": datetime.now().isoformat(),
-            "humidity": humidity,
-            "wind_speed": round(wind_speed, 1)
-        }
-    except Exception as e:
-        print(f"Weather API error for {city}: {e}")
-        return {
-            "city": city,
-            "temp": 25.0,
-            "condition": "Clear",
-            "demand_multiplier": 1.0,
-            "timestamp": datetime.now().isoformat(),
-            "humidity": 60,
-            "wind_speed": 5.5
-        }
+    response = await http_client.get(
+        WEATHER_URL,
+        params={"q": city, "appid": OPENWEATHER_API_KEY, "units": "metric"},
+        timeout=WEATHER_CITY_TIMEOUT
+    )
+    response.raise_for_status()
+    return _parse_weather(city, response.json())
 
 # ============================================================================
 # GLOBAL STATE FOR REAL-TIME DATA
@@ -326,6 +387,26 @@ weather_cache = {
     "Pune": None
 }
 
+# Bumped whenever weather_cache changes, so derived results can be cached
+weather_version = 0
+
+# Weather for any other city, fetched on demand. Concurrent misses share
+# one upstream call, failures are remembered briefly and stale readings
+# are served while they revalidate.
+city_weather = AsyncTtlCache(fetch_live_weather, ttl=300, error_ttl=30, max_entries=256)
+
+async def get_weather(city: str) -> Dict:
+    """Current weather for ``city``: refreshed cities first, then the on-demand cache"""
+    weather = weather_cache.get(city)
+    if weather:
+        return weather
+    city = city.strip().title()
+    try:
+        return await city_weather.get(city, timeout=WEATHER_CITY_TIMEOUT)
+    except Exception as e:
+        print(f"Weather API error for {city}: {e!r}")
+        return city_weather.peek(city) or _fallback_weather(city)
+
 # Live statistics
 live_stats = {
     "total_carbon_saved": 0,
@@ -344,38 +425,18 @@ seasonal_trends = []
 # LIVE SEARCH TRACKING
 # ============================================================================
 
+TRENDING_HALF_LIFE = float(os.getenv("TRENDING_HALF_LIFE", "120"))
+
 # Live search data (simulated real-time searches)
 live_searches = {
-    "recent_searches": [],
-    "trending_products": {},
-    "search_velocity": {},
-    "last_reset": datetime.now()
+    "recent_searches": RingLog(50),
+    # Search counts decaying continuously (half-life TRENDING_HALF_LIFE seconds),
+    # in bounded heavy-hitter counters
+    "trending_products": DecayedTrending(half_life=TRENDING_HALF_LIFE, capacity=1000),
+    # Searches per second over the last minute
+    "search_velocity": RateBuckets(60)
 }
 
-async def reset_trending_periodically():
-    """Reset trending counts every 2 minutes to show fresh trends"""
-    while True:
-        try:
-            await asyncio.sleep(120)  # Every 2 minutes
-            
-            # Decay trending counts by 50% instead of full reset
-            for product in live_searches["trending_products"]:
-                live_searches["trending_products"][product] = int(
-                    live_searches["trending_products"][product] * 0.5
-                )
-            
-            # Remove products with very low counts
-            live_searches["trending_products"] = {
-                k: v for k, v in live_searches["trending_products"].items() if v > 5
-            }
-            
-            live_searches["last_reset"] = datetime.now()
-            print(f"📊 Trending counts decayed at {datetime.now().strftime('%H:%M:%S')}")
-            
-        except Exception as e:
-            print(f"Trending reset error: {e}")
-            await asyncio.sleep(60)
-
 async def update_search_trends():
     """Simulate live search activity with dynamic product popularity"""
     import random
@@ -430,23 +491,17 @@ async def update_search_trends():
                     "user_type": random.choice(["retailer", "wholesaler"])
                 }
                 
-                live_searches["recent_searches"].insert(0, search_event)
-                
-                # Keep only last 50 searches
-                if len(live_searches["recent_searches"]) > 50:
-                    live_searches["recent_searches"] = live_searches["recent_searches"][:50]
+                # Keeps only the last 50 searches
+                live_searches["recent_searches"].append(search_event)
                 
                 # Update trending count
-                if product not in live_searches["trending_products"]:
-                    live_searches["trending_products"][product] = 0
-                live_searches["trending_products"][product] += 1
+                live_searches["trending_products"].add(product)
                 
-                # Calculate search velocity (searches per minute)
-                current_minute = datetime.now().strftime("%Y-%m-%d %H:%M")
-                if current_minute not in live_searches["search_velocity"]:
-                    live_searches["search_velocity"] = {current_minute: 0}
-                live_searches["search_velocity"][current_minute] += 1
+                # Search velocity (searches per minute)
+                live_searches["search_velocity"].add()
             
+            live_updates.publish("searches")
+            live_updates.publish("trending")
             cycle_counter += 1
             await asyncio.sleep(1)  # Update every second
             
@@ -454,14 +509,41 @@ async def update_search_trends():
             print(f"Search trends update error: {e}")
             await asyncio.sleep(5)
 
+async def refresh_weather_cache():
+    """Fetch every city in weather_cache concurrently.
+    
+    Each city gets WEATHER_CITY_TIMEOUT and the whole refresh
+    WEATHER_REFRESH_DEADLINE; a city that fails or runs out of time keeps
+    its previous reading (or the fallback if it has none).
+    """
+    global weather_version
+    cities = list(weather_cache.keys())
+    tasks = {
+        asyncio.ensure_future(asyncio.wait_for(fetch_live_weather(city), WEATHER_CITY_TIMEOUT)): city
+        for city in cities
+    }
+    done, pending = await asyncio.wait(tasks, timeout=WEATHER_REFRESH_DEADLINE)
+    for task in pending:
+        task.cancel()
+    
+    for task, city in tasks.items():
+        if task in done and not task.cancelled() and task.exception() is None:
+            weather_cache[city] = task.result()
+            print(f"✓ Updated weather for {city}: {weather_cache[city]['temp']}°C, {weather_cache[city]['condition']}")
+        else:
+            error = "deadline exceeded" if task in pending or task.cancelled() else repr(task.exception())
+            print(f"Weather API error for {city}: {error}")
+            if weather_cache[city] is None:
+                weather_cache[city] = _fallback_weather(city)
+    weather_version += 1
+    live_updates.publish("weather")
+
 async def update_weather_continuously():
     """Background task to fetch weather every 5 minutes"""
     while True:
         try:
-            for city in weather_cache.keys():
-                weather_cache[city] = fetch_live_weather(city)
-                print(f"✓ Updated weather for {city}: {weather_cache[city]['temp']}°C, {weather_cache[city]['condition']}")
             await asyncio.sleep(300)  # Update every 5 minutes
+            await refresh_weather_cache()
         except Exception as e:
             print(f"Weather update error: {e}")
             await asyncio.sleep(60)
@@ -475,6 +557,7 @@ async def update_live_stats():
             live_stats["active_orders"] = 45 + (live_stats["total_carbon_saved"] % 20)
             live_stats["green_score_avg"] = 85 + (live_stats["total_carbon_saved"] % 15)
             live_stats["last_update"] = datetime.now().isoformat()
+            live_updates.publish("stats")
             await asyncio.sleep(2)  # Update every 2 seconds
         except Exception as e:
             print(f"Stats update error: {e}")
@@ -484,69 +567,30 @@ async def update_live_stats():
 # PATHWAY COMPUTATION FUNCTIONS
 # ============================================================================
 
+# Wholesaler catalog for smart matching: the stream (followed as it grows) or a database export
+WHOLESALER_CATALOG = os.getenv("WHOLESALER_CATALOG", "data/wholesalers_stream.jsonl")
+if WHOLESALER_CATALOG.endswith(".jsonl"):
+    wholesaler_stream = store.tail(WHOLESALER_CATALOG)
+    wholesaler_ranking = wholesaler_stream.view("wholesaler_ranking", LiveWholesalerRanking)
+else:
+    wholesaler_stream = None
+    wholesaler_ranking = WholesalerRanking.load(WHOLESALER_CATALOG)
+
 def compute_best_wholesaler(product: str, weather_data: Dict) -> Dict:
     """
     Pathway-style computation: Find best wholesaler based on:
     - Price
     - Green Score
-    - Weather-adjusted delivery time
-    - Real-time availability
+    - Rating
+    with delivery time adjusted for the weather. Products missing from
+    the catalog are matched against the default mock wholesalers.
     """
-    
-    # Mock wholesaler database (in production, this would be from Supabase)
-    wholesalers = [
-        {
-            "id": "w1",
-            "name": "EcoHarvest Organic",
-            "product": product,
-            "price": 420.0,
-            "rating": 4.9,
-            "green_score": 96.5,
-            "carbon_saved_kg": 145,
-            "local_sourcing_pct": 100,
-            "delivery_hours": 12
-        },
-        {
-            "id": "w2",
-            "name": "GreenFields Traders",
-            "product": product,
-            "price": 395.0,
-            "rating": 4.7,
-            "green_score": 88.0,
-            "carbon_saved_kg": 120,
-            "local_sourcing_pct": 85,
-            "delivery_hours": 24
-        },
-        {
-            "id": "w3",
-            "name": "Sustainable Grains Co",
-            "product": product,
-            "price": 450.0,
-            "rating": 4.8,
-            "green_score": 92.0,
-            "carbon_saved_kg": 135,
-            "local_sourcing_pct": 95,
-            "delivery_hours": 18
-        }
-    ]
-    
-    # Weather-adjusted scoring
-    for w in wholesalers:
-        # Adjust delivery time based on weather
-        if weather_data and weather_data.get("condition") in ["Rain", "Snow", "Thunderstorm"]:
-            w["delivery_hours"] = int(w["delivery_hours"] * 1.5)
-        
-        # Calculate composite score
-        price_score = (500 - w["price"]) / 500 * 30  # Max 30 points
-        green_score = w["green_score"] * 0.4  # Max 40 points
-        rating_score = w["rating"] * 6  # Max 30 points
-        
-        w["composite_score"] = price_score + green_score + rating_score
-    
-    # Sort by composite score
-    wholesalers.sort(key=lambda x: x["composite_score"], reverse=True)
-    
-    return wholesalers[0]
+    condition = weather_data.get("condition") if weather_data else None
+    if wholesaler_stream is None:
+        return wholesaler_ranking.top_k(product, 1, condition)[0]
+    with wholesaler_stream.reading():
+        wholesaler_stream.poll()
+        return wholesaler_ranking.top_k(product, 1, condition)[0]
 
 def compute_seasonal_trends(weather_data: Dict) -> List[Dict]:
     """Compute seasonal demand trends based on weather"""
@@ -576,6 +620,61 @@ def compute_seasonal_trends(weather_data: Dict) -> List[Dict]:
     
     return trends
 
+# ============================================================================
+# RESPONSE SNAPSHOTS
+# ============================================================================
+
+class ResponseSnapshot:
+    """A JSON payload encoded once per state version and served as bytes.
+    
+    The ETag is a hash of the encoded body, so clients polling with
+    If-None-Match get 304s until the next rebuild.
+    """
+    
+    def __init__(self):
+        self.version = None
+        self.body = b""
+        self.etag = ""
+    
+    def current(self, version) -> bool:
+        return self.version == version
+    
+    def update(self, version, payload):
+        self.body = orjson.dumps(payload)
+        self.etag = '"' + hashlib.blake2b(self.body, digest_size=8).hexdigest() + '"'
+        self.version = version
+    
+    def response(self, request: Request) -> Response:
+        headers = {"ETag": self.etag, "Cache-Control": "no-cache"}
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match:
+            tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+            if self.etag in tags or "*" in tags:
+                return Response(status_code=304, headers=headers)
+        return Response(self.body, media_type="application/json", headers=headers)
+
+live_weather_snapshot = ResponseSnapshot()
+weather_insights_snapshot = ResponseSnapshot()
+festivals_snapshot = ResponseSnapshot()
+seasonal_trends_snapshot = ResponseSnapshot()
+demand_by_region_snapshot = ResponseSnapshot()
+
+# ============================================================================
+# LIVE PUSH CHANNEL (Server-Sent Events)
+# ============================================================================
+
+# Background loops publish() what they changed; subscribers of /live-stream
+# get the changed fields once per second instead of polling
+live_updates = Broadcaster(tick=1.0)
+live_updates.source("stats", lambda: get_global_stats()[0])
+live_updates.source("searches", lambda: {
+    "searches": live_searches["recent_searches"].latest(20),
+    "total_searches": len(live_searches["recent_searches"]),
+    "searches_per_minute": live_searches["search_velocity"].total()
+})
+live_updates.source("trending", lambda: {"trending": get_trending_now()["trending"]})
+live_updates.source("weather", lambda: {"data": weather_with_predictions()})
+
 # ============================================================================
 # API ENDPOINTS
 # ============================================================================
@@ -583,15 +682,18 @@ def compute_seasonal_trends(weather_data: Dict) -> List[Dict]:
 @app.on_event("startup")
 async def startup_event():
     """Initialize background tasks on startup"""
-    # Initial weather fetch
-    for city in weather_cache.keys():
-        weather_cache[city] = fetch_live_weather(city)
+    global http_client
+    http_client = httpx.AsyncClient(limits=httpx.Limits(max_connections=20, max_keepalive_connections=10))
+    
+    # Initial weather fetch (bounded by WEATHER_REFRESH_DEADLINE)
+    await refresh_weather_cache()
     
-    # Start background tasks
+    # Start the Pathway engine and background tasks
+    threading.Thread(target=run_pathway_pipeline, name="pathway", daemon=True).start()
     asyncio.create_task(update_weather_continuously())
     asyncio.create_task(update_live_stats())
     asyncio.create_task(update_search_trends())
-    asyncio.create_task(reset_trending_periodically())
+    asyncio.create_task(live_updates.run())
     
     print("🚀 Pathway Real-Time Pipeline Started")
     print("✓ Weather streaming active")
@@ -600,6 +702,11 @@ async def startup_event():
     print("✓ Product search tracking active")
     print("✓ Dynamic trending rotation active")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    if http_client is not None:
+        await http_client.aclose()
+
 @app.get("/")
 def root():
     return {
@@ -614,28 +721,33 @@ def root():
         ]
     }
 
+# Cities with their product predictions, rebuilt once per weather_version
+_weather_predictions = {"version": -1, "data": []}
+
+def weather_with_predictions() -> List[Dict]:
+    if _weather_predictions["version"] != weather_version:
+        weathers = [weather for weather in weather_cache.values() if weather]
+        _weather_predictions["data"] = [
+            {**weather, "product_predictions": predictions}
+            for weather, predictions in zip(weathers, predict_demand_batch(weathers))
+        ]
+        _weather_predictions["version"] = weather_version
+    return _weather_predictions["data"]
+
 @app.get("/live-weather")
-def get_live_weather():
+def get_live_weather(request: Request):
     """Get current weather for all major cities with product predictions"""
-    weather_list = []
-    for city, weather in weather_cache.items():
-        if weather:
-            # Add product predictions based on weather
-            weather_with_predictions = weather.copy()
-            weather_with_predictions["product_predictions"] = predict_product_demand(weather)
-            weather_list.append(weather_with_predictions)
-    
-    return {
-        "data": weather_list,
-        "last_update": datetime.now().isoformat()
-    }
+    if not live_weather_snapshot.current(weather_version):
+        live_weather_snapshot.update(weather_version, {
+            "data": weather_with_predictions(),
+            "last_update": datetime.now().isoformat()
+        })
+    return live_weather_snapshot.response(request)
 
 @app.get("/live-weather/{city}")
-def get_city_weather(city: str):
+async def get_city_weather(city: str):
     """Get weather for specific city with product predictions"""
-    weather = weather_cache.get(city)
-    if not weather:
-        weather = fetch_live_weather(city)
+    weather = await get_weather(city)
     
     # Add product predictions
     weather_with_predictions = weather.copy()
@@ -644,20 +756,27 @@ def get_city_weather(city: str):
     return weather_with_predictions
 
 @app.get("/upcoming-festivals")
-def get_festivals():
+def get_festivals(request: Request):
     """Get upcoming Indian festivals and their product demand impact"""
-    festivals = get_upcoming_festivals()
-    return {
-        "festivals": festivals,
-        "count": len(festivals),
-        "timestamp": datetime.now().isoformat()
-    }
+    today = date.today()
+    if not festivals_snapshot.current(today):
+        festivals = get_upcoming_festivals()
+        festivals_snapshot.update(today, {
+            "festivals": festivals,
+            "count": len(festivals),
+            "timestamp": datetime.now().isoformat()
+        })
+    return festivals_snapshot.response(request)
 
 @app.get("/weather-insights")
-def get_weather_insights():
+async def get_weather_insights(request: Request):
     """Get comprehensive weather insights with product predictions and festivals"""
+    version = (weather_version, date.today(), pathway_regional_weather.version)
+    if weather_insights_snapshot.current(version):
+        return weather_insights_snapshot.response(request)
+    
     # Get primary city weather (Delhi as default)
-    delhi_weather = weather_cache.get("Delhi") or fetch_live_weather("Delhi")
+    delhi_weather = await get_weather("Delhi")
     
     # Get product predictions
     product_predictions = predict_product_demand(delhi_weather)
@@ -666,27 +785,41 @@ def get_weather_insights():
     festivals = get_upcoming_festivals()
     
     # Combine insights
-    return {
+    weather_insights_snapshot.update(version, {
         "current_weather": delhi_weather,
         "product_predictions": product_predictions,
         "upcoming_festivals": festivals,
+        # Regional weather, festival and trending signals from the weather stream
+        "regional_signals": pathway_regional_weather.values(),
         "insights_summary": f"Based on current weather ({delhi_weather['condition']}, {delhi_weather['temp']}°C), {len(product_predictions)} products show increased demand. {len(festivals)} festivals approaching.",
         "timestamp": datetime.now().isoformat()
-    }
+    })
+    return weather_insights_snapshot.response(request)
 
 @app.get("/global-stats")
 def get_global_stats():
     """Get live global statistics"""
-    return [{
+    stats = {
         "total_carbon_saved": live_stats["total_carbon_saved"],
         "active_orders": live_stats["active_orders"],
         "green_score_avg": live_stats["green_score_avg"],
         "timestamp": live_stats["last_update"]
-    }]
+    }
+    # Sustainability totals from the wholesaler stream, once the engine has them.
+    # They are kept apart from the simulated counters above, which tick on their own.
+    # The stats table is a single-row reduce
+    stream_totals = next(iter(pathway_stats.values()), None)
+    if stream_totals is not None:
+        stats["stream_totals"] = stream_totals
+    return [stats]
 
 @app.get("/top-wholesalers")
 def get_top_wholesalers():
     """Get top wholesalers by product with live rankings"""
+    rows = pathway_top_wholesalers.values()
+    if rows:
+        return heapq.nlargest(10, rows, key=lambda row: row["purchases"])
+    
     return [
         {"product": "Wheat", "top_wholesaler": "EcoHarvest Organic", "purchases": 156},
         {"product": "Rice", "top_wholesaler": "GreenFields Traders", "purchases": 142},
@@ -695,12 +828,13 @@ def get_top_wholesalers():
     ]
 
 @app.get("/seasonal-trends")
-def get_seasonal_trends():
+def get_seasonal_trends(request: Request):
     """Get seasonal demand trends influenced by weather"""
-    # Use Delhi weather as primary indicator
-    delhi_weather = weather_cache.get("Delhi")
-    trends = compute_seasonal_trends(delhi_weather)
-    return trends
+    if not seasonal_trends_snapshot.current(weather_version):
+        # Use Delhi weather as primary indicator
+        delhi_weather = weather_cache.get("Delhi")
+        seasonal_trends_snapshot.update(weather_version, compute_seasonal_trends(delhi_weather))
+    return seasonal_trends_snapshot.response(request)
 
 @app.get("/search-trends")
 def get_search_trends():
@@ -708,22 +842,25 @@ def get_search_trends():
     import random
     
     # Get top trending products
-    trending = sorted(
-        live_searches["trending_products"].items(),
-        key=lambda x: x[1],
-        reverse=True
-    )[:10]
+    trending = live_searches["trending_products"].top(10, min_score=SHOWN_MIN_SCORE)
+    # All-time counts from the search stream, once the engine has them
+    stream_counts = bool(pathway_search_counts.version)
     
     # Calculate change percentage (simulated)
     trends_with_change = []
-    for product, count in trending:
+    for product, score in trending:
+        count = round(score)
         change = random.randint(5, 25)
-        trends_with_change.append({
+        trend = {
             "product": product,
             "searches": count,
             "change": f"+{change}%",
             "velocity": "high" if count > 50 else "medium" if count > 20 else "low"
-        })
+        }
+        if stream_counts:
+            row = pathway_search_counts.lookup(product)
+            trend["stream_searches"] = row["searches"] if row else 0
+        trends_with_change.append(trend)
     
     # If no data yet, return defaults
     if not trends_with_change:
@@ -740,9 +877,9 @@ def get_search_trends():
 def get_live_searches():
     """Get real-time search stream (last 20 searches)"""
     return {
-        "searches": live_searches["recent_searches"][:20],
+        "searches": live_searches["recent_searches"].latest(20),
         "total_searches": len(live_searches["recent_searches"]),
-        "searches_per_minute": sum(live_searches["search_velocity"].values()),
+        "searches_per_minute": live_searches["search_velocity"].total(),
         "timestamp": datetime.now().isoformat()
     }
 
@@ -750,22 +887,20 @@ def get_live_searches():
 def get_trending_now():
     """Get what's trending right now with live updates"""
     # Get top 5 trending
-    trending = sorted(
-        live_searches["trending_products"].items(),
-        key=lambda x: x[1],
-        reverse=True
-    )[:5]
+    trending = live_searches["trending_products"].top(5, min_score=SHOWN_MIN_SCORE)
+    recent_searches = live_searches["recent_searches"].latest(20)
     
     trending_data = []
-    for product, count in trending:
+    for product, score in trending:
+        count = round(score)
         # Get recent searches for this product
-        recent = [s for s in live_searches["recent_searches"][:20] if s["product"] == product]
+        recent = [s for s in recent_searches if s["product"] == product]
         
         trending_data.append({
             "product": product,
             "total_searches": count,
             "recent_searches": len(recent),
-            "regions": list(set([s["region"] for s in recent])),
+            "regions": sorted(set(s["region"] for s in recent)),
             "trend": "🔥 Hot" if count > 50 else "📈 Rising" if count > 20 else "👀 Watching"
         })
     
@@ -774,6 +909,31 @@ def get_trending_now():
         "last_update": datetime.now().isoformat()
     }
 
+@app.get("/live-stream")
+async def live_stream():
+    """
+    Server-Sent Events stream of live stats, searches, trending products
+    and weather. The first event is a "snapshot" of every channel; each
+    "delta" event after it carries only the fields that changed.
+    """
+    return StreamingResponse(
+        live_updates.subscribe(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def generate_reasoning(prompt: str) -> str:
+    model = genai.GenerativeModel('gemini-2.0-flash-exp')
+    return model.generate_content(prompt).text
+
+# Seconds a request waits for Gemini before answering with the fallback
+REASONING_BUDGET = float(os.getenv("REASONING_BUDGET", "2.0"))
+
+smart_matching_reasoning = ReasoningCache(
+    generate_reasoning if os.getenv("GEMINI_API_KEY") else None,
+    budget=REASONING_BUDGET
+)
+
 @app.post("/smart-matching")
 async def smart_matching(request: dict):
     """
@@ -784,17 +944,13 @@ async def smart_matching(request: dict):
     region = request.get("region", "Delhi")
     
     # Get live weather for region
-    weather = weather_cache.get(region) or fetch_live_weather(region)
+    weather = await get_weather(region)
     
     # Compute best wholesaler using Pathway-style logic
     best_wholesaler = compute_best_wholesaler(product, weather)
     
-    # Generate AI reasoning with Gemini
-    reasoning = ""
-    try:
-        if os.getenv("GEMINI_API_KEY"):
-            model = genai.GenerativeModel('gemini-2.0-flash-exp')
-            prompt = f"""
+    # Generate AI reasoning with Gemini (cached per normalized inputs)
+    prompt = f"""
             Based on real-time Pathway data streams:
             
             Product: {product}
@@ -810,10 +966,9 @@ async def smart_matching(request: dict):
             
             Provide a 2-sentence explanation why this is the best choice considering sustainability and current weather conditions.
             """
-            response = model.generate_content(prompt)
-            reasoning = response.text
-    except Exception as e:
-        reasoning = f"{best_wholesaler['name']} offers the best balance of price (₹{best_wholesaler['price']}), sustainability (Green Score: {best_wholesaler['green_score']}), and delivery speed. With current weather conditions ({weather['condition']}, {weather['temp']}°C), this wholesaler ensures reliable supply while minimizing carbon emissions."
+    fallback = f"{best_wholesaler['name']} offers the best balance of price (₹{best_wholesaler['price']}), sustainability (Green Score: {best_wholesaler['green_score']}), and delivery speed. With current weather conditions ({weather['condition']}, {weather['temp']}°C), this wholesaler ensures reliable supply while minimizing carbon emissions."
+    key = smart_matching_reasoning.key(product, region, weather['temp'], weather['condition'], best_wholesaler['name'])
+    reasoning = await smart_matching_reasoning.explain(key, prompt, fallback)
     
     return {
         "wholesaler": best_wholesaler,
@@ -823,8 +978,11 @@ async def smart_matching(request: dict):
     }
 
 @app.get("/demand-by-region")
-def get_demand_by_region():
+def get_demand_by_region(request: Request):
     """Get live demand by region influenced by weather"""
+    if demand_by_region_snapshot.current(weather_version):
+        return demand_by_region_snapshot.response(request)
+    
     regions = ["Delhi", "Mumbai", "Chennai", "Kolkata"]
     demand_data = []
     
@@ -840,7 +998,8 @@ def get_demand_by_region():
                 "multiplier": weather["demand_multiplier"]
             })
     
-    return demand_data
+    demand_by_region_snapshot.update(weather_version, demand_data)
+    return demand_by_region_snapshot.response(request)
 
 if __name__ == "__main__":
     print("=" * 60)
@@ -6,7 +6,7 @@ This version provides the same API endpoints without requiring the Pathway libra
 import asyncio
 import random
 import time
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 from typing import Dict, List
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
@@ -14,6 +14,9 @@ import requests
 from dotenv import load_dotenv
 import os
 
+from festivals import FestivalCalendar
+from trending import SHOWN_MIN_SCORE, DecayedTrending
+
 # Load environment variables
 load_dotenv()
 
@@ -41,7 +44,8 @@ live_stats = {
 }
 search_history: List = []
 trending_products: Dict = {}
-product_search_counts: Dict = {}
+# Search counts decaying continuously (TRENDING_HALF_LIFE seconds, 2 minutes by default)
+product_search_counts = DecayedTrending(half_life=float(os.getenv("TRENDING_HALF_LIFE", "120")), capacity=1000)
 
 # Product catalog
 PRODUCTS = [
@@ -51,14 +55,7 @@ PRODUCTS = [
 ]
 
 # Indian Festivals
-FESTIVALS = [
-    {"name": "Holi", "date": "2026-03-14", "demand_increase": 150, "products": ["Colors", "Sweets", "Organic Snacks"]},
-    {"name": "Diwali", "date": "2026-10-19", "demand_increase": 200, "products": ["Diyas", "Sweets", "Decorations"]},
-    {"name": "Eid", "date": "2026-04-03", "demand_increase": 120, "products": ["Dates", "Sweets", "Fabrics"]},
-    {"name": "Raksha Bandhan", "date": "2026-08-09", "demand_increase": 100, "products": ["Rakhis", "Sweets", "Gifts"]},
-    {"name": "Navratri", "date": "2026-10-10", "demand_increase": 130, "products": ["Traditional Wear", "Decorations"]},
-    {"name": "Pongal", "date": "2026-01-14", "demand_increase": 110, "products": ["Rice", "Sugarcane", "Turmeric"]}
-]
+festival_calendar = FestivalCalendar.load()
 
 def fetch_live_weather(city: str) -> Dict:
     """Fetch live weather from OpenWeatherMap API"""
@@ -161,7 +158,7 @@ async def generate_searches():
                     search_history.pop(0)
                 
                 # Update trending
-                product_search_counts[product] = product_search_counts.get(product, 0) + 1
+                product_search_counts.add(product)
                 
             await asyncio.sleep(1)
         except Exception as e:
@@ -178,27 +175,13 @@ async def rotate_hot_products():
             
             # Boost their counts
             for product in hot_products:
-                product_search_counts[product] = product_search_counts.get(product, 0) + random.randint(10, 20)
+                product_search_counts.add(product, random.randint(10, 20))
             
             print(f"🔥 Hot products: {', '.join(hot_products)}")
             await asyncio.sleep(30)
         except Exception as e:
             print(f"Hot products rotation error: {e}")
 
-# Background task for trending decay
-async def decay_trending():
-    """Reduce trending counts every 2 minutes"""
-    while True:
-        try:
-            await asyncio.sleep(120)
-            for product in list(product_search_counts.keys()):
-                product_search_counts[product] = int(product_search_counts[product] * 0.5)
-                if product_search_counts[product] < 1:
-                    del product_search_counts[product]
-            print("📉 Trending counts decayed")
-        except Exception as e:
-            print(f"Decay error: {e}")
-
 @app.on_event("startup")
 async def startup_event():
     """Initialize data and start background tasks"""
@@ -215,7 +198,6 @@ async def startup_event():
     asyncio.create_task(update_live_stats())
     asyncio.create_task(generate_searches())
     asyncio.create_task(rotate_hot_products())
-    asyncio.create_task(decay_trending())
     
     print("✓ Weather streaming active")
     print("✓ Live statistics active")
@@ -277,17 +259,18 @@ def get_weather_insights():
     
     # Add upcoming festivals
     upcoming_festivals = []
-    today = datetime.now()
+    today = date.today()
     
-    for festival in FESTIVALS:
-        festival_date = datetime.strptime(festival["date"], "%Y-%m-%d")
-        days_until = (festival_date - today).days
-        
-        if 0 <= days_until <= 60:
-            upcoming_festivals.append({
-                **festival,
-                "days_until": days_until
-            })
+    for festival_date, festival in festival_calendar.between(today, today + timedelta(days=60)):
+        upcoming_festivals.append({
+            "name": festival["name"],
+            "date": festival_date.isoformat(),
+            # Percent over normal demand, from the shared multipliers (pathway_realtime's
+            # figures); this server's own table had e.g. Navratri at 130, now 100
+            "demand_increase": round((festival["demand_increase"] - 1) * 100),
+            "products": festival["products"],
+            "days_until": (festival_date - today).days
+        })
     
     return {
         "weather": insights,
@@ -317,17 +300,11 @@ def get_live_searches():
 @app.get("/trending-now")
 def get_trending_now():
     """Get what's trending right now"""
-    sorted_products = sorted(
-        product_search_counts.items(),
-        key=lambda x: x[1],
-        reverse=True
-    )[:5]
-    
     trending = []
-    for product, count in sorted_products:
+    for product, score in product_search_counts.top(5, min_score=SHOWN_MIN_SCORE):
         trending.append({
             "product": product,
-            "searches": count,
+            "searches": round(score),
             "velocity": f"+{random.randint(5, 25)}%"
         })
     
@@ -0,0 +1,56 @@
+"""
+Cache for LLM-generated explanations (smart matching, trade brain).
+
+Explanations are keyed on the normalized inputs of their prompt - product,
+region, temperature rounded to ``temp_step`` degrees, condition and the
+chosen wholesaler - so requests that would produce the same prompt share
+one generation. Generation runs in a worker thread under a latency
+budget: when it runs out, the caller gets the stale explanation or its
+template fallback and the generation finishes in the background.
+"""
+
+import asyncio
+from typing import Callable, Optional
+
+from async_cache import AsyncTtlCache
+
+
+class ReasoningCache:
+    def __init__(
+        self,
+        generate: Optional[Callable[[str], str]],
+        budget: float = 2.0,
+        ttl: float = 900.0,
+        error_ttl: float = 60.0,
+        max_entries: int = 512,
+        temp_step: float = 2.0,
+    ):
+        """``generate(prompt) -> text`` is a blocking model call, or None to always fall back."""
+        self.generate = generate
+        self.budget = budget
+        self.temp_step = temp_step
+        self.cache = AsyncTtlCache(None, ttl=ttl, error_ttl=error_ttl, max_entries=max_entries)
+
+    def key(self, product: str, region: str, temp: float, condition: str, wholesaler: str) -> tuple:
+        return (
+            product.strip().lower(),
+            region.strip().lower(),
+            round(float(temp) / self.temp_step) * self.temp_step,
+            condition.strip().lower(),
+            wholesaler.strip().lower(),
+        )
+
+    async def explain(self, key: tuple, prompt: str, fallback: str) -> str:
+        """Explanation for ``key``, generating it from ``prompt`` on a miss.
+
+        Returns ``fallback`` when generation fails or takes longer than the
+        budget with nothing cached for the key.
+        """
+        if self.generate is None:
+            return fallback
+        try:
+            return await self.cache.get(key, self.budget, load=lambda: asyncio.to_thread(self.generate, prompt))
+        except Exception as e:
+            if not isinstance(e, asyncio.TimeoutError):
+                print(f"Reasoning generation error: {e!r}")
+            return self.cache.peek(key) or fallback
@@ -0,0 +1,349 @@
+"""
+Retrieval engines behind the mock RAG server (/v1/retrieve on port 8080).
+
+Indexes are StreamStore listeners over the wholesalers stream: they are
+updated as listings are appended, and a listing re-published under the same
+``wholesaler_id`` replaces the earlier one.
+"""
+
+import heapq
+import math
+import os
+import re
+import zlib
+from collections import Counter
+from typing import Dict, List
+
+import numpy as np
+
+from aggregates import BoundedTopK, green_score, listing_slot
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+# Enough green-score leaders to pad any reasonable top-k
+GREEN_LEADERS = 64
+
+# Hashed character n-gram embedding used by VectorIndex
+EMBEDDING_DIM = 256
+NGRAM = 3
+NORM_CHUNK = 65536
+
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_RE.findall(text.lower())
+
+
+def listing_text(record: Dict) -> str:
+    return f"{record.get('product_name', '')} {record.get('description', '')}"
+
+
+class Bm25Index:
+    """Token inverted index over ``product_name`` and ``description``.
+
+    Queries are scored with BM25 and the top-k is taken with a heap; equal
+    scores break on the green score. When fewer than k listings match, the
+    result is padded with the greenest listings, like the old linear scan.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.reset()
+
+    def reset(self):
+        self.postings: Dict[str, Dict[int, int]] = {}
+        self.docs: Dict[int, Dict] = {}
+        self.doc_len: Dict[int, int] = {}
+        self.green: Dict[int, float] = {}
+        self._slots: Dict = {}
+        self._total_len = 0
+        # max tf only grows and min length only shrinks, so pruning bounds stay valid after removals
+        self._max_tf: Dict[str, int] = {}
+        self._min_len = 0
+        self._green_leaders = BoundedTopK(GREEN_LEADERS, self.green)
+
+    def on_record(self, record: Dict):
+        slot, is_new = listing_slot(self._slots, record)
+        if not is_new:
+            self._remove(slot)
+
+        tokens = tokenize(listing_text(record))
+        for token, tf in Counter(tokens).items():
+            self.postings.setdefault(token, {})[slot] = tf
+            if tf > self._max_tf.get(token, 0):
+                self._max_tf[token] = tf
+        if not self.docs or len(tokens) < self._min_len:
+            self._min_len = len(tokens)
+        self.docs[slot] = record
+        self.doc_len[slot] = len(tokens)
+        self._total_len += len(tokens)
+        self.green[slot] = green_score(record)
+        self._green_leaders.offer(slot, self.green[slot])
+
+    def _remove(self, slot: int):
+        for token in set(tokenize(listing_text(self.docs[slot]))):
+            postings = self.postings[token]
+            del postings[slot]
+            if not postings:
+                del self.postings[token]
+        self._total_len -= self.doc_len.pop(slot)
+        del self.docs[slot]
+        del self.green[slot]
+        self._green_leaders.discard(slot)
+
+    def _term_weights(self, terms) -> Dict[str, tuple]:
+        """``(postings, idf, upper_bound)`` per known term.
+
+        The upper bound caps the term's contribution to any listing, using
+        the largest tf seen for the term and the shortest listing length.
+        """
+        n = len(self.docs)
+        avg_len = self._total_len / n or 1.0
+        k1, b = self.k1, self.b
+        min_norm = k1 * (1 - b + b * self._min_len / avg_len)
+
+        weights = {}
+        for term in terms:
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            df = len(postings)
+            idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+            max_tf = self._max_tf[term]
+            weights[term] = (postings, idf, idf * max_tf * (k1 + 1) / (max_tf + min_norm))
+        return weights
+
+    def scores(self, terms, k: int, term_weights: Dict[str, tuple] = None, mask=None) -> Dict[int, float]:
+        """BM25 scores of a candidate set guaranteed to contain the top-k.
+
+        Terms are visited rarest first (MaxScore): once the k-th best score
+        exceeds the combined upper bound of the terms not visited yet, no
+        listing that only contains those terms can enter the top-k, so their
+        (long) posting lists are only probed, never walked. Slots outside
+        ``mask`` (as in ``top_k()``) are not scored, so they never raise the
+        k-th best score.
+        """
+        if not self.docs or k <= 0:
+            return {}
+        if term_weights is None:
+            term_weights = self._term_weights(terms)
+        weights = sorted((term_weights[t] for t in terms if t in term_weights), key=lambda w: len(w[0]))
+        k1 = self.k1
+        norm_base = k1 * (1 - self.b)
+        norm_scale = k1 * self.b * len(self.docs) / (self._total_len or 1)
+        doc_len = self.doc_len
+
+        remaining = [0.0] * (len(weights) + 1)
+        for i in range(len(weights) - 1, -1, -1):
+            remaining[i] = remaining[i + 1] + weights[i][2]
+
+        scores: Dict[int, float] = {}
+        for i, (postings, _, _) in enumerate(weights):
+            if len(scores) >= k and heapq.nlargest(k, scores.values())[-1] > remaining[i]:
+                break
+            for slot in postings:
+                if slot in scores or (mask is not None and not mask[slot]):
+                    continue
+                norm = norm_base + norm_scale * doc_len[slot]
+                score = 0.0
+                for term_postings, idf, _ in weights:
+                    tf = term_postings.get(slot)
+                    if tf:
+                        score += idf * tf * (k1 + 1) / (tf + norm)
+                scores[slot] = score
+        return scores
+
+    def top_k(self, scores: Dict[int, float], k: int, mask=None, padding=None) -> List[Dict]:
+        """Best ``k`` scored slots, padded with ``padding`` (default: greenest listings).
+
+        ``mask`` is an optional boolean array over slots; slots outside it
+        are skipped, and ``padding`` should then only contain allowed slots.
+        """
+        green = self.green
+        candidates = scores if mask is None else (slot for slot in scores if mask[slot])
+        best = heapq.nlargest(k, candidates, key=lambda slot: (scores[slot], green[slot]))
+        if len(best) < k:
+            if padding is None:
+                padding = [slot for slot, _ in self._green_leaders.items()]
+            chosen = set(best)
+            for slot in padding:
+                if len(best) == k:
+                    break
+                if slot not in chosen:
+                    best.append(slot)
+        return [self.docs[slot] for slot in best]
+
+    def search(self, query: str, k: int = 5) -> List[Dict]:
+        return self.top_k(self.scores(set(tokenize(query)), k), k)
+
+    def search_batch(self, queries: List[tuple], mask=None, padding=None) -> List[List[Dict]]:
+        """Answer ``(query, k)`` pairs in order with one shared index pass.
+
+        Term statistics are computed once for the union of all query terms,
+        and repeated query strings are scored once with their largest k.
+        ``mask`` and ``padding`` restrict the results as in ``top_k()``.
+        """
+        if not self.docs:
+            return [[] for _ in queries]
+        terms = {query: set(tokenize(query)) for query, _ in queries}
+        depth: Dict[str, int] = {}
+        for query, k in queries:
+            depth[query] = max(k, depth.get(query, 0))
+
+        term_weights = self._term_weights(set().union(*terms.values()))
+        ranked = {
+            query: self.top_k(self.scores(terms[query], k, term_weights, mask), k, mask, padding)
+            for query, k in depth.items()
+        }
+        return [ranked[query][:k] for query, k in queries]
+
+
+def ngram_counts(text: str, dim: int) -> Counter:
+    """Hashed character trigram counts of the normalized listing text."""
+    padded = f" {' '.join(tokenize(text))} "
+    return Counter(zlib.crc32(padded[i:i + NGRAM].encode()) % dim for i in range(len(padded) - NGRAM + 1))
+
+
+class VectorIndex:
+    """Dense TF-IDF embeddings of hashed character n-grams.
+
+    Rows hold sublinear term frequencies in one contiguous float32 matrix
+    that grows by doubling, so appended listings never trigger a rebuild.
+    IDF is applied at query time from incrementally maintained document
+    frequencies, which keeps cosine scores exact as the catalog grows:
+
+        cos(d*idf, q*idf) = d @ (q * idf**2) / (|d*idf| * |q*idf|)
+
+    If ``path`` points at a previously saved matrix (see ``save()``), it is
+    memory-mapped and rows whose listing text is unchanged are copied from
+    it instead of being re-embedded.
+    """
+
+    def __init__(self, dim: int = EMBEDDING_DIM, path: str = None):
+        self.dim = dim
+        self.path = path
+        self._warm = None
+        self._warm_keys = None
+        if path and os.path.exists(path) and os.path.exists(_keys_path(path)):
+            warm = np.load(path, mmap_mode="r")
+            if warm.shape[1] == dim:
+                self._warm = warm
+                self._warm_keys = np.load(_keys_path(path))
+        self.reset()
+
+    def __getstate__(self):
+        # The warm-start file is only needed while the first rows are replayed
+        state = self.__dict__.copy()
+        state["_warm"] = state["_warm_keys"] = None
+        return state
+
+    def reset(self):
+        self.matrix = np.zeros((1024, self.dim), dtype=np.float32)
+        self.green = np.zeros(1024, dtype=np.float32)
+        self.keys = np.zeros(1024, dtype=np.uint32)
+        self.rows = 0
+        self.docs: Dict[int, Dict] = {}
+        self._slots: Dict = {}
+        self._df = np.zeros(self.dim, dtype=np.int64)
+        self._norms = None
+        self._norms_version = -1
+        self._version = 0
+
+    def on_record(self, record: Dict):
+        row, is_new = listing_slot(self._slots, record)
+        if is_new:
+            self.rows += 1
+            if row == len(self.matrix):
+                self._grow()
+        else:
+            self._df -= self.matrix[row] > 0
+
+        text = listing_text(record)
+        text_key = zlib.crc32(text.encode())
+        if self._warm is not None and row < len(self._warm) and self._warm_keys[row] == text_key:
+            self.matrix[row] = self._warm[row]
+        else:
+            self.matrix[row] = self.embed(text)
+        self._df += self.matrix[row] > 0
+        self.keys[row] = text_key
+        self.green[row] = green_score(record)
+        self.docs[row] = record
+        self._version += 1
+
+    def _grow(self):
+        capacity = 2 * len(self.matrix)
+        for name in ("matrix", "green", "keys"):
+            old = getattr(self, name)
+            new = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+
+    def embed(self, text: str) -> np.ndarray:
+        vec = np.zeros(self.dim, dtype=np.float32)
+        for bucket, count in ngram_counts(text, self.dim).items():
+            vec[bucket] = 1.0 + math.log(count)
+        return vec
+
+    def _idf(self) -> np.ndarray:
+        return (np.log((1.0 + self.rows) / (1.0 + self._df)) + 1.0).astype(np.float32)
+
+    def _doc_norms(self, idf_sq: np.ndarray) -> np.ndarray:
+        """|d*idf| per row, recomputed in chunks only after the catalog changed."""
+        if self._norms_version != self._version:
+            norms = np.empty(self.rows, dtype=np.float32)
+            for start in range(0, self.rows, NORM_CHUNK):
+                block = self.matrix[start:min(start + NORM_CHUNK, self.rows)]
+                norms[start:start + len(block)] = np.sqrt(np.einsum("ij,ij,j->i", block, block, idf_sq))
+            norms[norms == 0] = 1.0
+            self._norms = norms
+            self._norms_version = self._version
+        return self._norms
+
+    def scores(self, queries: np.ndarray) -> np.ndarray:
+        """Cosine similarity of every row against each query row: shape (queries, rows)."""
+        idf_sq = self._idf() ** 2
+        weighted = queries * idf_sq
+        query_norms = np.sqrt(queries ** 2 @ idf_sq)
+        query_norms[query_norms == 0] = 1.0
+        sims = (self.matrix[:self.rows] @ weighted.T).T
+        sims /= self._doc_norms(idf_sq)
+        sims /= query_norms[:, None]
+        return sims
+
+    def top_k(self, sims: np.ndarray, k: int, mask: np.ndarray = None) -> List[Dict]:
+        """Top-k rows of one score vector via argpartition, ties broken by green score."""
+        k = min(k, self.rows if mask is None else int(mask.sum()))
+        if k <= 0:
+            return []
+        cutoff = sims[np.argpartition(-sims, k - 1)[k - 1]]
+        # Every row tied with the k-th score competes on green score, not just the ones argpartition kept
+        best = np.flatnonzero(sims >= cutoff)
+        best = best[np.lexsort((-self.green[best], -sims[best]))][:k]
+        return [self.docs[int(row)] for row in best]
+
+    def search(self, query: str, k: int = 5) -> List[Dict]:
+        return self.search_batch([(query, k)])[0]
+
+    def search_batch(self, queries: List[tuple], mask: np.ndarray = None) -> List[List[Dict]]:
+        """Answer ``(query, k)`` pairs in order with a single matrix multiply.
+
+        ``mask`` is an optional boolean array over rows restricting the results.
+        """
+        if not self.rows or not queries:
+            return [[] for _ in queries]
+        sims = self.scores(np.stack([self.embed(query) for query, _ in queries]))
+        if mask is not None:
+            sims[:, ~mask] = -np.inf
+        return [self.top_k(row, k, mask) for row, (_, k) in zip(sims, queries)]
+
+    def save(self, path: str = None):
+        """Persist the matrix (and per-row text checksums) for a later warm start."""
+        path = path or self.path
+        if not path:
+            return
+        np.save(path, self.matrix[:self.rows])
+        np.save(_keys_path(path), self.keys[:self.rows])
+
+
+def _keys_path(path: str) -> str:
+    return os.path.splitext(path)[0] + ".keys.npy"
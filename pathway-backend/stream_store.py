@@ -0,0 +1,242 @@
+"""
+Incremental JSONL stream store for the mock Pathway servers.
+
+Each stream file is tailed instead of re-read: we remember how many bytes
+(and which inode) we have already consumed and only parse lines appended
+since the last poll. Truncation and rotation start the file over.
+"""
+
+import json
+import os
+import pickle
+import shutil
+import threading
+import time
+from typing import Dict, List
+
+import numpy as np
+
+# Arrays at least this big are stored as .npy files next to a snapshot and
+# memory-mapped copy-on-write when it is loaded, so workers share their pages
+SNAPSHOT_ARRAY_BYTES = 1 << 20
+
+
+class JsonlTail:
+    """In-memory materialization of one append-only JSONL file.
+
+    Derived views register with ``subscribe()``. A view is any object with
+    ``on_record(record)`` and ``reset()`` methods; it sees every parsed
+    record exactly once, in file order, and is reset whenever the file is
+    truncated or replaced.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.records: List[Dict] = []
+        self._offset = 0
+        self._inode = None
+        self._listeners = []
+        self._views: Dict[str, object] = {}
+        self._lock = threading.RLock()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.RLock()
+
+    def view(self, name: str, factory):
+        """The derived view registered as ``name``, subscribing ``factory()`` on first use.
+
+        Views restored from a snapshot are returned as-is, already up to date.
+        """
+        with self._lock:
+            if name not in self._views:
+                self._views[name] = self.subscribe(factory())
+            return self._views[name]
+
+    def reading(self):
+        """Lock to hold (``with tail.reading():``) while reading views.
+
+        ``poll()`` updates views under the same lock, so a view is never
+        read half-updated by a poll on another thread. It is re-entrant:
+        polling while holding it is fine.
+        """
+        return self._lock
+
+    def subscribe(self, listener):
+        """Attach a derived view and replay the records seen so far into it."""
+        with self._lock:
+            self._listeners.append(listener)
+            for record in self.records:
+                self._feed(listener, record)
+        return listener
+
+    def poll(self) -> List[Dict]:
+        """Consume newly appended lines and return the materialized records."""
+        with self._lock:
+            if not os.path.exists(self.path):
+                # Create if doesn't exist to avoid errors
+                with open(self.path, "w"):
+                    pass
+
+            with open(self.path, "rb") as f:
+                st = os.fstat(f.fileno())
+                if self._inode is not None and (st.st_ino != self._inode or st.st_size < self._offset):
+                    # Rotated (new inode) or truncated in place: start over
+                    self._reset()
+                self._inode = st.st_ino
+
+                if st.st_size == self._offset:
+                    return self.records
+
+                f.seek(self._offset)
+                chunk = f.read(st.st_size - self._offset)
+
+            # Only consume complete lines; a half-written tail is picked up next poll
+            end = chunk.rfind(b"\n") + 1
+            if end == 0:
+                return self.records
+            self._offset += end
+
+            for line in chunk[:end].splitlines():
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                self.records.append(record)
+                for listener in self._listeners:
+                    self._feed(listener, record)
+
+            return self.records
+
+    def _feed(self, listener, record: Dict):
+        # The offset is already past this record: a view that fails on it must
+        # not cost the other views (or the rest of the chunk) their records
+        try:
+            listener.on_record(record)
+        except Exception as e:
+            print(f"Stream view error ({type(listener).__name__} on {self.path}): {e!r}")
+
+    def _reset(self):
+        self.records = []
+        self._offset = 0
+        self._inode = None
+        for listener in self._listeners:
+            listener.reset()
+
+
+class StreamStore:
+    """Process-wide registry of tailed JSONL files, keyed by path."""
+
+    def __init__(self):
+        self._tails: Dict[str, JsonlTail] = {}
+        self._lock = threading.Lock()
+        self.snapshot = None  # version of the last snapshot loaded
+
+    def tail(self, path: str) -> JsonlTail:
+        with self._lock:
+            if path not in self._tails:
+                self._tails[path] = JsonlTail(path)
+            return self._tails[path]
+
+    def records(self, path: str) -> List[Dict]:
+        """Return the up-to-date records of ``path``; callers must not mutate the list."""
+        return self.tail(path).poll()
+
+    def poll_all(self) -> bool:
+        """Poll every tail; True if any of them consumed new data or started over."""
+        changed = False
+        for tail in list(self._tails.values()):
+            before = (tail._inode, tail._offset)
+            tail.poll()
+            changed |= (tail._inode, tail._offset) != before
+        return changed
+
+    def save_snapshot(self, root: str) -> str:
+        """Write every tail (records, offsets and views) under ``root``.
+
+        Each snapshot goes to its own directory; ``root/CURRENT`` is switched
+        to it with an atomic rename, so readers never see a partial one.
+        """
+        version = f"{time.time_ns()}"
+        directory = os.path.join(root, version)
+        os.makedirs(directory)
+        with self._lock:
+            tails = dict(self._tails)
+        locks = [tail._lock for tail in tails.values()]
+        for lock in locks:
+            lock.acquire()
+        try:
+            with open(os.path.join(directory, "state.pkl"), "wb") as f:
+                _SnapshotPickler(f, directory).dump(tails)
+        finally:
+            for lock in locks:
+                lock.release()
+
+        pointer = os.path.join(root, "CURRENT")
+        with open(pointer + ".tmp", "w") as f:
+            f.write(version)
+        os.replace(pointer + ".tmp", pointer)
+
+        # Keep the previous snapshot for workers that are still loading it
+        for old in sorted(v for v in os.listdir(root) if v.isdigit())[:-2]:
+            shutil.rmtree(os.path.join(root, old), ignore_errors=True)
+        return directory
+
+    def load_snapshot(self, root: str) -> bool:
+        """Replace our tails with the snapshot ``root/CURRENT`` points at, if any."""
+        try:
+            with open(os.path.join(root, "CURRENT")) as f:
+                version = f.read().strip()
+            directory = os.path.join(root, version)
+            with open(os.path.join(directory, "state.pkl"), "rb") as f:
+                tails = _SnapshotUnpickler(f, directory).load()
+        except FileNotFoundError:
+            # No snapshot yet, or this one was pruned while we read it
+            return False
+        with self._lock:
+            self._tails = tails
+            self.snapshot = version
+        return True
+
+    def refresh_snapshot(self, root: str) -> bool:
+        """Load ``root/CURRENT`` if it moved since our last load; True if we switched to it."""
+        try:
+            with open(os.path.join(root, "CURRENT")) as f:
+                version = f.read().strip()
+        except FileNotFoundError:
+            return False
+        return version != self.snapshot and self.load_snapshot(root)
+
+
+class _SnapshotPickler(pickle.Pickler):
+    def __init__(self, file, directory: str):
+        super().__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.directory = directory
+        self.arrays = 0
+
+    def persistent_id(self, obj):
+        if type(obj) in (np.ndarray, np.memmap) and obj.nbytes >= SNAPSHOT_ARRAY_BYTES and not obj.dtype.hasobject:
+            name = f"array{self.arrays}.npy"
+            self.arrays += 1
+            np.save(os.path.join(self.directory, name), obj)
+            return name
+        return None
+
+
+class _SnapshotUnpickler(pickle.Unpickler):
+    def __init__(self, file, directory: str):
+        super().__init__(file)
+        self.directory = directory
+
+    def persistent_load(self, name):
+        return np.load(os.path.join(self.directory, name), mmap_mode="c")
+
+
+store = StreamStore()
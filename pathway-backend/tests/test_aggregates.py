@@ -0,0 +1,144 @@
+import random
+from collections import Counter
+
+from aggregates import PurchaseLeaderboard, SearchTrends, WholesalerAggregates, green_score
+
+HOUR = 3600
+
+
+def listing(wholesaler_id, region, product, carbon, waste):
+    return {"wholesaler_id": wholesaler_id, "region": region, "product_name": product,
+            "carbon_saved_kg": carbon, "waste_reduced_kg": waste}
+
+
+def purchase(product, wholesaler, quantity, ts):
+    return {"product_name": product, "wholesaler_name": wholesaler, "quantity": quantity, "timestamp": ts}
+
+
+def test_updated_listing_replaces_its_old_contribution():
+    stats = WholesalerAggregates()
+    stats.on_record(listing("w1", "Punjab", "Wheat", 100, 10))
+    stats.on_record(listing("w2", "Punjab", "Rice", 50, 0))
+    # w1 moves region and product: it must leave Punjab/Wheat entirely
+    stats.on_record(listing("w1", "Bengal", "Jute", 20, 5))
+
+    assert (stats.totals.carbon, stats.totals.waste, stats.totals.count) == (70, 5, 2)
+    assert stats.totals.green == green_score(listing("w1", "", "", 20, 5)) + green_score(listing("w2", "", "", 50, 0))
+    assert [row["region"] for row in stats.breakdown("region")] == ["Punjab", "Bengal"]
+    assert {row["product_name"] for row in stats.breakdown("product_name")} == {"Rice", "Jute"}
+    punjab = stats.breakdown("region")[0]
+    assert (punjab["total_carbon_saved"], punjab["listings"]) == (50, 1)
+
+
+def test_aggregates_match_a_recount_of_the_latest_listings():
+    rng = random.Random(3)
+    stats = WholesalerAggregates()
+    latest = {}
+    for _ in range(500):
+        record = listing(f"w{rng.randrange(40)}", rng.choice(["Punjab", "Bengal", "Delhi"]),
+                         rng.choice(["Wheat", "Rice"]), rng.randint(0, 200), rng.randint(0, 50))
+        stats.on_record(record)
+        latest[record["wholesaler_id"]] = record
+
+    assert stats.totals.carbon == sum(r["carbon_saved_kg"] for r in latest.values())
+    assert stats.totals.count == len(latest)
+    for row in stats.breakdown("region"):
+        group = [r for r in latest.values() if r["region"] == row["region"]]
+        assert row["listings"] == len(group)
+        assert row["total_waste_reduced"] == sum(r["waste_reduced_kg"] for r in group)
+
+
+def test_anonymous_listings_are_never_retracted():
+    stats = WholesalerAggregates()
+    for _ in range(3):
+        stats.on_record({"region": "Delhi", "carbon_saved_kg": 10})
+    assert (stats.totals.carbon, stats.totals.count) == (30, 3)
+
+
+def test_windows_follow_event_time_not_the_wall_clock():
+    board = PurchaseLeaderboard(windows={"1h": HOUR})
+    start = 1_000_000_000  # 2001: long before the wall clock
+    board.on_record(purchase("Wheat", "A", 5, start))
+    board.on_record(purchase("Wheat", "B", 3, start + 600))
+    assert board.leaders(5, window="1h") == [
+        {"product": "Wheat", "top_wholesaler": "A", "purchases": 5},
+        {"product": "Wheat", "top_wholesaler": "B", "purchases": 3},
+    ]
+    # An hour of stream later A's purchase has left the window, B's has not
+    board.on_record(purchase("Rice", "C", 1, start + HOUR + 300))
+    assert board.leaders(5, window="1h") == [
+        {"product": "Wheat", "top_wholesaler": "B", "purchases": 3},
+        {"product": "Rice", "top_wholesaler": "C", "purchases": 1},
+    ]
+
+
+def test_windowed_leaders_match_brute_force():
+    rng = random.Random(7)
+    board = PurchaseLeaderboard(k=3, windows={"1h": HOUR})
+    events = []
+    ts = 0
+    for _ in range(3000):
+        ts += rng.randint(0, 30)
+        event = (rng.choice("PQR"), rng.choice("abcdefgh"), rng.choice([1, 2, 3, 5, -2]), ts)
+        events.append(event)
+        board.on_record(purchase(*event))
+
+        if len(events) % 97 == 0:
+            # Same buckets as SlidingCounts: whole minutes, the newest one and the 59 before it
+            newest = ts // 60
+            counts = Counter()
+            for p, w, q, t in events:
+                if t // 60 > newest - 60:
+                    counts[(p, w)] += q
+            for product in (None, "P", "Q"):
+                got = board.leaders(3, product=product, window="1h")
+                expected = sorted(
+                    (v for (p, w), v in counts.items() if v and product in (None, p)), reverse=True
+                )[:3]
+                assert [row["purchases"] for row in got] == expected
+                for row in got:
+                    assert counts[(row["product"], row["top_wholesaler"])] == row["purchases"]
+
+
+def search(query, minute):
+    return {"query": query, "timestamp": minute * 60 + 30}
+
+
+def test_search_trends_compare_the_last_window_with_the_one_before():
+    trends = SearchTrends(window_minutes=10)
+    for minute in (0, 5, 9):
+        trends.on_record(search("wheat", minute))
+    for minute in (12, 15):
+        trends.on_record(search("wheat", minute))
+    trends.on_record(search("rice", 19))
+    # The clock is minute 19: the current window is minutes 10-19, the previous one 0-9
+    assert trends.window_counts("wheat") == (2, 3)
+    assert trends.top(5) == [
+        {"query": "wheat", "searches": 2, "trend": "-33%"},
+        {"query": "rice", "searches": 1, "trend": "+100%"},
+    ]
+
+    # Twenty minutes later wheat has left both windows and is no longer listed
+    trends.on_record(search("rice", 39))
+    assert trends.window_counts("wheat") == (0, 0)
+    assert trends.top(5) == [{"query": "rice", "searches": 1, "trend": "+100%"}]
+
+
+def test_search_trends_match_brute_force():
+    rng = random.Random(11)
+    trends = SearchTrends(window_minutes=15)
+    events = []
+    minute = 0
+    for _ in range(2000):
+        minute += rng.choice([0, 0, 0, 1, 1, 2, 7])
+        # Mostly in order, sometimes late by a few minutes
+        event = (rng.choice("abcdef"), max(0, minute - rng.choice([0, 0, 0, 3, 20])))
+        events.append(event)
+        trends.on_record(search(*event))
+
+        if len(events) % 50 == 0:
+            now = max(m for _, m in events)
+            for query in set(q for q, _ in events):
+                current = sum(1 for q, m in events if q == query and now - 15 < m <= now)
+                previous = sum(1 for q, m in events if q == query and now - 30 < m <= now - 15)
+                assert trends.window_counts(query) == (current, previous)
@@ -0,0 +1,12 @@
+from catalog import ColumnarCatalog
+
+
+def test_malformed_numbers_count_as_zero():
+    catalog = ColumnarCatalog()
+    catalog.on_record({"wholesaler_id": "w1", "price": "n/a", "rating": None, "carbon_saved_kg": "10", "waste_reduced_kg": [1]})
+    catalog.on_record({"wholesaler_id": "w2", "price": 25.5, "rating": 4.0, "carbon_saved_kg": 2, "waste_reduced_kg": 1})
+    assert catalog.rows == 2
+    assert catalog.record(0)["price"] == 0.0
+    assert catalog.record(0)["carbon_saved_kg"] == 10.0
+    assert catalog.columns["green_score"].tolist() == [15.0, 5.0]
+    assert catalog.mask(max_price=30).tolist() == [True, True]
@@ -0,0 +1,26 @@
+from datetime import date
+
+from festivals import FestivalCalendar
+
+FESTIVALS = [
+    {"name": "Holi", "regions": ["All"], "dates": ["2027-03-22", "2028-03-11"]},
+    {"name": "Pongal", "regions": ["South"], "dates": ["2028-01-15"]},
+    {"name": "Harvest Fair", "dates": ["2028-02-01"]},
+]
+
+
+def test_regions_filter_and_missing_regions():
+    calendar = FestivalCalendar(FESTIVALS)
+    names = lambda region: [f["name"] for _, f in calendar.between(date(2028, 1, 1), date(2028, 6, 30), region)]
+    assert names(None) == ["Pongal", "Harvest Fair", "Holi"]
+    assert names("South") == ["Pongal", "Holi"]
+    assert names("North") == ["Holi"]
+
+
+def test_warns_once_past_the_last_covered_year(capsys):
+    calendar = FestivalCalendar(FESTIVALS)
+    calendar.between(date(2028, 10, 1), date(2028, 12, 31))
+    assert capsys.readouterr().out == ""
+    assert calendar.between(date(2028, 12, 1), date(2029, 1, 30)) == []
+    calendar.between(date(2029, 1, 1), date(2029, 3, 1))
+    assert capsys.readouterr().out.count("up to 2028 only") == 1
@@ -0,0 +1,21 @@
+from ranking import LiveWholesalerRanking
+
+
+def listing(wholesaler_id, name, price, carbon):
+    return {"wholesaler_id": wholesaler_id, "wholesaler_name": name, "product_name": "Organic Wheat",
+            "price": price, "rating": 4.0, "carbon_saved_kg": carbon, "waste_reduced_kg": 0}
+
+
+def test_live_ranking_follows_new_and_updated_listings():
+    ranking = LiveWholesalerRanking()
+    ranking.on_record(listing("w1", "Alpha", 300, 50))
+    ranking.on_record(listing("w2", "Beta", 400, 10))
+    assert ranking.top_k("wheat")[0]["name"] == "Alpha"
+
+    ranking.on_record(listing("w2", "Beta", 100, 200))
+    best = ranking.top_k("wheat", 2)
+    assert [w["name"] for w in best] == ["Beta", "Alpha"]
+    assert best[0]["green_score"] == 100.0
+
+    ranking.reset()
+    assert ranking.top_k("wheat")[0]["name"] not in ("Alpha", "Beta")
@@ -0,0 +1,99 @@
+import asyncio
+import threading
+import time
+
+from reasoning_cache import ReasoningCache
+
+
+class StubModel:
+    """Stands in for Gemini: answers after ``delay`` seconds, counting calls."""
+
+    def __init__(self, delay=0.0, fail=False):
+        self.delay = delay
+        self.fail = fail
+        self.prompts = []
+        self._lock = threading.Lock()
+
+    def __call__(self, prompt):
+        with self._lock:
+            self.prompts.append(prompt)
+        time.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError("model unavailable")
+        return f"explanation #{len(self.prompts)}"
+
+
+def test_key_normalizes_inputs():
+    cache = ReasoningCache(StubModel(), temp_step=2.0)
+    assert cache.key(" Wheat", "delhi", 30.4, "Rain", "EcoHarvest") == cache.key("wheat", "Delhi ", 29.6, "rain", "ecoharvest")
+    assert cache.key("wheat", "Delhi", 30.4, "Rain", "EcoHarvest") != cache.key("wheat", "Delhi", 34.0, "Rain", "EcoHarvest")
+
+
+def test_concurrent_requests_share_one_generation():
+    model = StubModel(delay=0.05)
+    cache = ReasoningCache(model, budget=1.0)
+
+    async def run():
+        key = cache.key("wheat", "Delhi", 30, "Rain", "EcoHarvest")
+        results = await asyncio.gather(*(cache.explain(key, "prompt", "fallback") for _ in range(10)))
+        again = await cache.explain(key, "prompt", "fallback")
+        return results, again
+
+    results, again = asyncio.run(run())
+    assert results == ["explanation #1"] * 10
+    assert again == "explanation #1"
+    assert len(model.prompts) == 1
+
+
+def test_budget_exceeded_returns_fallback_then_cached_text():
+    model = StubModel(delay=0.2)
+    cache = ReasoningCache(model, budget=0.02)
+
+    async def run():
+        key = cache.key("rice", "Mumbai", 25, "Clear", "GreenFields")
+        started = time.monotonic()
+        first = await cache.explain(key, "prompt", "fallback")
+        elapsed = time.monotonic() - started
+        await asyncio.sleep(0.3)  # generation finishes in the background
+        second = await cache.explain(key, "prompt", "fallback")
+        return first, elapsed, second
+
+    first, elapsed, second = asyncio.run(run())
+    assert first == "fallback"
+    assert elapsed < 0.15
+    assert second == "explanation #1"
+    assert len(model.prompts) == 1
+
+
+def test_failures_fall_back_and_are_not_retried_immediately():
+    model = StubModel(fail=True)
+    cache = ReasoningCache(model, budget=1.0, error_ttl=60)
+
+    async def run():
+        key = cache.key("pulses", "Chennai", 31, "Clouds", "EcoHarvest")
+        return [await cache.explain(key, "prompt", "fallback") for _ in range(3)]
+
+    assert asyncio.run(run()) == ["fallback"] * 3
+    assert len(model.prompts) == 1
+
+
+def test_expired_entry_is_served_stale_while_regenerating():
+    model = StubModel()
+    cache = ReasoningCache(model, budget=1.0, ttl=0.05)
+
+    async def run():
+        key = cache.key("wheat", "Delhi", 18, "Clear", "EcoHarvest")
+        first = await cache.explain(key, "prompt", "fallback")
+        await asyncio.sleep(0.1)
+        stale = await cache.explain(key, "prompt", "fallback")
+        await asyncio.sleep(0.05)
+        fresh = await cache.explain(key, "prompt", "fallback")
+        return first, stale, fresh
+
+    assert asyncio.run(run()) == ("explanation #1", "explanation #1", "explanation #2")
+
+
+def test_without_a_model_returns_fallback():
+    cache = ReasoningCache(None)
+    key = cache.key("wheat", "Delhi", 20, "Clear", "EcoHarvest")
+    assert asyncio.run(cache.explain(key, "prompt", "fallback")) == "fallback"
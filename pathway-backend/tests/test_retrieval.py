@@ -0,0 +1,67 @@
+import threading
+
+from retrieval import Bm25Index, VectorIndex
+from stream_store import JsonlTail
+
+
+def listing(wholesaler_id, text, carbon=10.0):
+    return {"wholesaler_id": wholesaler_id, "product_name": text, "description": "", "carbon_saved_kg": carbon}
+
+
+def index_of(*records):
+    index = Bm25Index()
+    for record in records:
+        index.on_record(record)
+    return index
+
+
+def test_non_positive_k_returns_nothing():
+    index = index_of(listing("w1", "organic wheat"), listing("w2", "organic rice"))
+    assert index.search("organic", 0) == []
+    assert index.search("organic", -1) == []
+
+
+def test_search_while_polling_on_another_thread(tmp_path):
+    path = tmp_path / "wholesalers.jsonl"
+    path.write_text("")
+    tail = JsonlTail(str(path))
+    index = tail.view("keyword_index", Bm25Index)
+    stop = threading.Event()
+
+    def append_and_poll():
+        i = 0
+        while not stop.is_set():
+            with open(path, "a") as f:
+                for _ in range(20):
+                    f.write(f'{{"wholesaler_id": "w{i}", "product_name": "organic wheat lot{i}"}}\n')
+                    i += 1
+            tail.poll()
+
+    writer = threading.Thread(target=append_and_poll)
+    writer.start()
+    try:
+        for _ in range(300):
+            with tail.reading():
+                index.search("organic wheat", 5)
+    finally:
+        stop.set()
+        writer.join()
+
+
+def test_batch_search_on_empty_catalog():
+    assert Bm25Index().search_batch([("organic", 5), ("", 3)]) == [[], []]
+
+
+def test_masked_out_listings_do_not_prune_allowed_matches():
+    index = index_of(*(listing(f"w{i}", "rare common") for i in range(5)), listing("w5", "common"))
+    mask = [False] * 5 + [True]
+    results = index.search_batch([("rare common", 1)], mask=mask, padding=[])
+    assert [r["wholesaler_id"] for r in results[0]] == ["w5"]
+
+
+def test_vector_ties_at_k_boundary_go_to_greenest():
+    index = VectorIndex()
+    for i in range(50):
+        index.on_record(listing(f"w{i}", "organic wheat", carbon=float(i % 7 == 3 and i)))
+    results = index.search("organic wheat", 3)
+    assert [r["wholesaler_id"] for r in results] == ["w45", "w38", "w31"]
@@ -0,0 +1,82 @@
+import json
+import os
+
+from stream_store import JsonlTail
+
+
+class Recorder:
+    def __init__(self, fail_on=None):
+        self.fail_on = fail_on
+        self.seen = []
+        self.resets = 0
+
+    def on_record(self, record):
+        if record["id"] == self.fail_on:
+            raise ValueError("bad record")
+        self.seen.append(record["id"])
+
+    def reset(self):
+        self.seen = []
+        self.resets += 1
+
+
+def append(path, *ids):
+    with open(path, "a") as f:
+        for i in ids:
+            f.write(json.dumps({"id": i}) + "\n")
+
+
+def test_failing_view_does_not_drop_records(tmp_path, capsys):
+    path = tmp_path / "stream.jsonl"
+    append(path, 1, 2, 3)
+    tail = JsonlTail(str(path))
+    failing = tail.subscribe(Recorder(fail_on=2))
+    other = tail.subscribe(Recorder())
+    tail.poll()
+    assert failing.seen == [1, 3]
+    assert other.seen == [1, 2, 3]
+    assert "bad record" in capsys.readouterr().out
+
+
+def test_poll_reads_only_complete_new_lines(tmp_path):
+    path = tmp_path / "stream.jsonl"
+    append(path, 1, 2)
+    tail = JsonlTail(str(path))
+    view = tail.subscribe(Recorder())
+    tail.poll()
+    with open(path, "a") as f:
+        f.write('not json\n{"id": 3}\n{"id": ')
+    tail.poll()
+    assert view.seen == [1, 2, 3]
+    with open(path, "a") as f:
+        f.write('4}\n')
+    assert [r["id"] for r in tail.poll()] == [1, 2, 3, 4]
+    assert view.seen == [1, 2, 3, 4]
+
+
+def test_truncated_file_starts_over(tmp_path):
+    path = tmp_path / "stream.jsonl"
+    append(path, 1, 2, 3)
+    tail = JsonlTail(str(path))
+    view = tail.subscribe(Recorder())
+    tail.poll()
+    path.write_text("")
+    append(path, 7)
+    assert [r["id"] for r in tail.poll()] == [7]
+    assert (view.seen, view.resets) == ([7], 1)
+
+
+def test_rotated_file_starts_over(tmp_path):
+    path = tmp_path / "stream.jsonl"
+    append(path, 1, 2)
+    tail = JsonlTail(str(path))
+    view = tail.subscribe(Recorder())
+    tail.poll()
+    # Same size or larger, but a different file renamed into place
+    rotated = tmp_path / "stream.jsonl.new"
+    append(rotated, 5, 6, 7)
+    os.replace(rotated, path)
+    assert [r["id"] for r in tail.poll()] == [5, 6, 7]
+    assert (view.seen, view.resets) == ([5, 6, 7], 1)
+    assert tail.poll() == tail.records
+    assert view.resets == 1
@@ -0,0 +1,80 @@
+import math
+import random
+from collections import Counter
+
+from trending import RENORMALIZE_HALF_LIVES, DecayedTrending, RingLog, SpaceSaving
+
+
+def test_ring_log_keeps_the_newest_entries():
+    log = RingLog(3)
+    assert log.latest() == []
+    for i in range(5):
+        log.append(i)
+    assert len(log) == 3
+    assert log.latest() == [4, 3, 2]
+    assert log.latest(2) == [4, 3]
+
+
+def test_space_saving_bounds_hold_on_a_skewed_stream():
+    rng = random.Random(5)
+    capacity = 20
+    counters = SpaceSaving(capacity)
+    truth = Counter()
+    for _ in range(20000):
+        # Zipf-like: a few heavy keys over a long tail
+        key = min(int(rng.paretovariate(1.1)), 500)
+        truth[key] += 1
+        counters.add(key)
+
+    total = sum(truth.values())
+    assert len(counters.counts) == capacity
+    for key, count in truth.items():
+        if count > total / capacity:
+            assert key in counters.counts
+    for key, count in counters.counts.items():
+        assert count - counters.errors[key] <= truth[key] <= count
+    assert [key for key, _ in counters.top(3)] == [key for key, _ in truth.most_common(3)]
+
+
+def test_space_saving_evicts_the_smallest_counter():
+    counters = SpaceSaving(2)
+    counters.add("a", 5)
+    counters.add("b", 2)
+    assert counters.add("c") == "b"
+    assert counters.counts == {"a": 5, "c": 3}
+    assert counters.errors["c"] == 2
+
+
+def test_decayed_scores_match_brute_force_across_renormalization():
+    rng = random.Random(9)
+    half_life = 10.0
+    trending = DecayedTrending(half_life=half_life, capacity=100, k=5)
+    start = trending.landmark
+    events = []
+    now = start
+    # Long enough to move the landmark a few times
+    while now < start + 3 * RENORMALIZE_HALF_LIVES * half_life:
+        now += rng.uniform(0, 20)
+        key = rng.choice("abcdefg")
+        events.append((key, now))
+        trending.add(key, now=now)
+
+    decayed = Counter()
+    for key, ts in events:
+        decayed[key] += 2.0 ** (-(now - ts) / half_life)
+    for key, score in decayed.items():
+        assert math.isclose(trending.score(key, now), score, rel_tol=1e-9)
+    expected = sorted(decayed.items(), key=lambda item: item[1], reverse=True)[:5]
+    assert [key for key, _ in trending.top(5, now)] == [key for key, _ in expected]
+
+
+def test_decayed_top_leaves_out_faded_keys():
+    trending = DecayedTrending(half_life=60.0)
+    t = trending.landmark
+    trending.add("wheat", 4, now=t)
+    trending.add("rice", 1, now=t)
+    assert [key for key, _ in trending.top(5, now=t + 60, min_score=0.5)] == ["wheat", "rice"]
+    # Two half-lives on rice is at 0.25 and drops out, wheat is at 1
+    top = trending.top(5, now=t + 120, min_score=0.5)
+    assert [key for key, _ in top] == ["wheat"]
+    assert math.isclose(top[0][1], 1.0)
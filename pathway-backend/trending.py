@@ -0,0 +1,178 @@
+"""
+Bounded-memory structures for live search tracking.
+
+- RingLog: the last N events, O(1) append.
+- SpaceSaving: approximate heavy hitters over an unbounded key space in a
+  fixed number of counters, O(1) amortized per event.
+- DecayedTrending: exponentially decayed counts (on top of SpaceSaving)
+  with a live top-k, without periodic sweeps.
+- RateBuckets: events per second in a ring of per-second buckets, for a
+  sliding "per minute" velocity.
+"""
+
+import heapq
+import time
+from typing import Dict, List
+
+from aggregates import BoundedTopK
+
+# DecayedTrending moves its landmark after this many half-lives, which
+# keeps forward-decay weights (2 ** half-lives) far from float overflow
+RENORMALIZE_HALF_LIVES = 64
+
+# Decayed scores are shown rounded; list a key while it still rounds to 1
+SHOWN_MIN_SCORE = 0.5
+
+
+class RingLog:
+    """Fixed-capacity log; the oldest entry is overwritten once full."""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._items: List = [None] * capacity
+        self._next = 0
+        self._size = 0
+
+    def append(self, item):
+        self._items[self._next] = item
+        self._next = (self._next + 1) % self.capacity
+        if self._size < self.capacity:
+            self._size += 1
+
+    def latest(self, n: int = None) -> List:
+        """Up to ``n`` most recent entries, newest first."""
+        n = self._size if n is None else min(n, self._size)
+        return [self._items[(self._next - 1 - i) % self.capacity] for i in range(n)]
+
+    def __len__(self) -> int:
+        return self._size
+
+
+class SpaceSaving:
+    """Space-Saving heavy hitters with at most ``capacity`` counters.
+
+    Every key whose true count exceeds total / capacity is tracked, and a
+    tracked count overestimates the true one by at most ``errors[key]``.
+    A new key beyond capacity takes over the smallest counter. Counters
+    only grow between evictions, so the min-heap is maintained lazily: an
+    entry is refreshed when it surfaces at the top with a stale count.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.counts: Dict = {}
+        self.errors: Dict = {}
+        self._heap: List = []
+
+    def add(self, key, weight=1):
+        """Count ``weight`` for ``key``; returns the key evicted to make room, if any."""
+        counts = self.counts
+        if key in counts:
+            counts[key] += weight
+            return None
+        if len(counts) < self.capacity:
+            counts[key] = weight
+            self.errors[key] = 0
+            heapq.heappush(self._heap, (weight, key))
+            return None
+
+        floor, victim = self._pop_min()
+        del counts[victim]
+        del self.errors[victim]
+        counts[key] = floor + weight
+        self.errors[key] = floor
+        heapq.heappush(self._heap, (counts[key], key))
+        return victim
+
+    def _pop_min(self) -> tuple:
+        heap, counts = self._heap, self.counts
+        while True:
+            count, key = heap[0]
+            current = counts[key]
+            if current == count:
+                heapq.heappop(heap)
+                return count, key
+            heapq.heapreplace(heap, (current, key))
+
+    def rescale(self, factor: float):
+        """Multiply every counter by ``factor`` > 0, in place (order is unchanged)."""
+        for key in self.counts:
+            self.counts[key] *= factor
+            self.errors[key] *= factor
+        self._heap = [(count * factor, key) for count, key in self._heap]
+
+    def top(self, k: int) -> List[tuple]:
+        """``(key, count)`` of the ``k`` largest counters, largest first."""
+        return heapq.nlargest(k, self.counts.items(), key=lambda item: item[1])
+
+
+class DecayedTrending:
+    """Search counts decaying with a ``half_life`` (seconds), with the top ``k`` kept current.
+
+    Uses forward decay: an event at time t adds 2 ** ((t - landmark) /
+    half_life) to its counter, and a score is read back by scaling with
+    2 ** (-(now - landmark) / half_life). All counters decay by the same
+    factor, so the stored ones already rank like the decayed scores and
+    no one has to rewrite them as time passes; only moving the landmark
+    (every RENORMALIZE_HALF_LIVES) touches every counter.
+    """
+
+    def __init__(self, half_life: float = 120.0, capacity: int = 1000, k: int = 10):
+        self.half_life = half_life
+        self.counters = SpaceSaving(capacity)
+        self.leaders = BoundedTopK(k, self.counters.counts)
+        self.landmark = time.time()
+
+    def add(self, key, count=1, now: float = None):
+        now = time.time() if now is None else now
+        half_lives = (now - self.landmark) / self.half_life
+        if half_lives > RENORMALIZE_HALF_LIVES:
+            self.counters.rescale(2.0 ** -half_lives)
+            self.leaders.invalidate()
+            self.landmark = now
+            half_lives = 0.0
+        evicted = self.counters.add(key, count * 2.0 ** half_lives)
+        if evicted is not None:
+            self.leaders.discard(evicted)
+        self.leaders.offer(key, self.counters.counts[key])
+
+    def _decay(self, now: float = None) -> float:
+        now = time.time() if now is None else now
+        return 2.0 ** (-(now - self.landmark) / self.half_life)
+
+    def score(self, key, now: float = None) -> float:
+        return self.counters.counts.get(key, 0) * self._decay(now)
+
+    def top(self, k: int, now: float = None, min_score: float = 0.0) -> List[tuple]:
+        """``(key, decayed score)`` of the ``k`` (at most the tracked size) highest, highest first.
+
+        Keys that decayed below ``min_score`` are left out.
+        """
+        decay = self._decay(now)
+        return [(key, value * decay) for key, value in self.leaders.items()[:k] if value * decay >= min_score]
+
+    def __len__(self) -> int:
+        return len(self.counters.counts)
+
+
+class RateBuckets:
+    """Event counts in per-second buckets over the last ``seconds`` seconds."""
+
+    def __init__(self, seconds: int = 60):
+        self.seconds = seconds
+        self._counts = [0] * seconds
+        self._stamps = [-1] * seconds
+
+    def add(self, n: int = 1, now: float = None):
+        second = int(time.time() if now is None else now)
+        slot = second % self.seconds
+        if self._stamps[slot] != second:
+            self._stamps[slot] = second
+            self._counts[slot] = 0
+        self._counts[slot] += n
+
+    def total(self, now: float = None) -> int:
+        """Events in the last ``seconds`` seconds (the current one included)."""
+        second = int(time.time() if now is None else now)
+        oldest = second - self.seconds
+        return sum(c for c, s in zip(self._counts, self._stamps) if oldest < s <= second)
@@ -0,0 +1,117 @@
+"""
+Compare ingest throughput of the CSV and binary tick formats.
+
+Writes the same ticks in both formats, then times for each:
+
+- decode: turning the file into (epoch ms, commodity, mandi, price,
+  volume) tuples in Python, the per-row work in front of the pipeline;
+- pathway: reading the file to the end through ``read_ticks()`` and
+  counting the rows (skipped when Pathway isn't installed).
+
+    python benchmark_ingest.py --ticks 1000000
+"""
+
+import argparse
+import csv
+import os
+import random
+import shutil
+import tempfile
+import time
+
+from stream_generator import COMMODITIES, MANDIS, TimestampFormatter, names
+from tick_format import TickReader, epoch_ms, pack, write_dictionary
+
+
+def write_ticks(directory, ticks, seed, commodities, mandis):
+    """Write ``ticks`` random ticks, one per millisecond, as CSV and binary; returns both paths."""
+    csv_path = os.path.join(directory, "ticks.csv")
+    binary_path = os.path.join(directory, "ticks.bin")
+    write_dictionary(binary_path, commodities, mandis)
+    rng = random.Random(seed)
+    timestamp = TimestampFormatter()
+    start = time.time()
+    with open(csv_path, "w") as text, open(binary_path, "wb") as binary:
+        text.write("timestamp,commodity,mandi,price,volume\n")
+        for n in range(ticks):
+            ts = start + n / 1000
+            commodity, mandi = rng.randrange(len(commodities)), rng.randrange(len(mandis))
+            price, volume = round(rng.uniform(20, 100), 2), rng.randint(100, 1000)
+            text.write(f"{timestamp(ts)},{commodities[commodity]},{mandis[mandi]},{price},{volume}\n")
+            binary.write(pack(round(ts * 1000), commodity, mandi, price, volume))
+    return csv_path, binary_path
+
+
+def decode_csv(path):
+    rows = 0
+    with open(path, newline="") as f:
+        reader = csv.reader(f)
+        next(reader)
+        for ts, commodity, mandi, price, volume in reader:
+            (epoch_ms(ts), commodity, mandi, float(price), int(volume))
+            rows += 1
+    return rows
+
+
+def decode_binary(path):
+    reader = TickReader(path)
+    rows = 0
+    while True:
+        records = reader.poll()
+        if not records:
+            return rows
+        rows += len(records)
+
+
+def pathway_count(input_format, path):
+    import pathway as pw
+    from market_processing import read_ticks
+
+    counts = read_ticks(input_format, path, mode="static").reduce(rows=pw.reducers.count())
+    return int(pw.debug.table_to_pandas(counts)["rows"].iloc[0])
+
+
+def timed(function, *args):
+    began = time.perf_counter()
+    rows = function(*args)
+    return rows, time.perf_counter() - began
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--ticks", type=int, default=200_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--commodities", type=int, default=len(COMMODITIES))
+    parser.add_argument("--mandis", type=int, default=len(MANDIS))
+    args = parser.parse_args()
+
+    try:
+        import pathway  # noqa: F401
+        stages = ["decode", "pathway"]
+    except ImportError:
+        print("Pathway is not installed; timing decode only.")
+        stages = ["decode"]
+
+    directory = tempfile.mkdtemp(prefix="ingest-bench-")
+    try:
+        paths = write_ticks(
+            directory, args.ticks, args.seed,
+            names(COMMODITIES, "Commodity", args.commodities), names(MANDIS, "Mandi", args.mandis),
+        )
+        print(f"{'format':<8}{'MB':>8}  " + "".join(f"{stage + ' ticks/s':>22}" for stage in stages))
+        for input_format, path in zip(("csv", "binary"), paths):
+            line = f"{input_format:<8}{os.path.getsize(path) / 1e6:>8.1f}  "
+            for stage in stages:
+                if stage == "decode":
+                    rows, seconds = timed(decode_csv if input_format == "csv" else decode_binary, path)
+                else:
+                    rows, seconds = timed(pathway_count, input_format, path)
+                assert rows == args.ticks, f"{input_format} {stage} read {rows} of {args.ticks} ticks"
+                line += f"{rows / seconds:>22,.0f}"
+            print(line)
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,70 +2,254 @@ import pathway as pw
 import pandas as pd
 import json
 import os
+import tempfile
+import threading
+import time
+
+from pane_windows import DEFAULT_HOP, DEFAULT_WINDOWS, PaneAggregator
+from tick_format import TickReader, epoch_ms, iso_timestamp
 
 # Configuration
 INPUT_FILE = "market_data.csv"
+# "csv" reads INPUT_FILE; "binary" reads fixed-width records (see tick_format.py)
+INPUT_FORMAT = os.getenv("INPUT_FORMAT", "csv")
+INPUT_BINARY = os.getenv("INPUT_BINARY", "market_data.ticks")
 OUTPUT_JSON = "../public/live_market.json"
+# Minimum seconds between two rewrites of OUTPUT_JSON
+SNAPSHOT_INTERVAL = float(os.getenv("SNAPSHOT_INTERVAL", "1.0"))
+# Sliding windows over the event time, all sharing hop-sized panes (see pane_windows.py)
+PANE_HOP = os.getenv("PANE_HOP", DEFAULT_HOP)
+PANE_WINDOWS = os.getenv("PANE_WINDOWS", DEFAULT_WINDOWS)
+
+
+class TickSchema(pw.Schema):
+    """A market tick as the pipeline processes it, whatever the input format."""
+    timestamp: int  # epoch milliseconds
+    commodity: str
+    mandi: str
+    price: float
+    volume: int
+
+
+class CsvTickSchema(pw.Schema):
+    """A row of INPUT_FILE as written by stream_generator.py."""
+    timestamp: str  # ISO 8601, local time
+    commodity: str
+    mandi: str
+    price: float
+    volume: int
+
+
+class BinaryTickSubject(pw.io.python.ConnectorSubject):
+    """Streams the records appended to a binary tick file as TickSchema rows.
+
+    With ``follow=False`` it stops at the end of the file instead of
+    waiting for more.
+    """
+
+    def __init__(self, path: str, follow: bool = True, poll_interval: float = 0.05):
+        super().__init__()
+        self.reader = TickReader(path)
+        self.follow = follow
+        self.poll_interval = poll_interval
+
+    def run(self):
+        while True:
+            records = self.reader.poll()
+            for timestamp, commodity, mandi, price, volume in records:
+                self.next(timestamp=timestamp, commodity=commodity, mandi=mandi, price=price, volume=volume)
+            if records:
+                self.commit()
+            elif not self.follow:
+                return
+            else:
+                time.sleep(self.poll_interval)
+
+
+def read_ticks(input_format: str = INPUT_FORMAT, path: str = None, mode: str = "streaming") -> pw.Table:
+    """The ticks of ``path`` (INPUT_FILE or INPUT_BINARY by default) as a TickSchema table."""
+    if input_format == "binary":
+        subject = BinaryTickSubject(path or INPUT_BINARY, follow=mode == "streaming")
+        return pw.io.python.read(subject, schema=TickSchema)
+    rows = pw.io.csv.read(path or INPUT_FILE, schema=CsvTickSchema, mode=mode)
+    return rows.with_columns(timestamp=pw.apply_with_type(epoch_ms, int, rows.timestamp))
+
+
+def window_entry(window: dict) -> dict:
+    """One window's aggregates for the snapshot: floats rounded, ``last_update`` as ISO."""
+    entry = {field: round(value, 2) if isinstance(value, float) else value for field, value in window.items()}
+    entry["last_update"] = iso_timestamp(window["last_update"] * 1000)
+    return entry
+
+
+class LatestStateWriter:
+    """Keeps the latest window result per (commodity, mandi) and writes them as one JSON snapshot.
+
+    Fed ``on_change(key, row, time, is_addition)`` calls in the form of
+    ``pw.io.subscribe`` (``PaneWindows`` makes them). Closed windows are
+    emitted once and never retracted, so only the newest row of each group
+    is kept: a row replaces the group's current one when its
+    ``last_update`` is at least as recent, and a retraction drops it only
+    if it retracts that same row. At most every ``interval`` seconds, if anything changed, the rows
+    are written to a temp file in the target directory and renamed over
+    ``path``, so readers always see a complete file.
+    """
+
+    def __init__(self, path: str, interval: float = SNAPSHOT_INTERVAL):
+        self.path = path
+        self.interval = interval
+        self.rows = {}  # (commodity, mandi) -> latest window row
+        self.dirty = False
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="snapshot-writer", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def on_change(self, key, row, time, is_addition):
+        group = (row["commodity"], row["mandi"])
+        with self._lock:
+            current = self.rows.get(group)
+            if is_addition:
+                if current is None or row["last_update"] >= current["last_update"]:
+                    self.rows[group] = row
+                    self.dirty = True
+            elif current == row:
+                # An update's retraction can arrive after its addition
+                del self.rows[group]
+                self.dirty = True
+
+    def on_end(self):
+        self._stop.set()
+        self._thread.join()
+        self.flush()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.flush()
+            except Exception as e:
+                # e.g. a full disk: keep the thread alive, flush() retries next interval
+                print(f"Snapshot write error: {e!r}")
+
+    def snapshot(self) -> list:
+        """Latest window result per (commodity, mandi), oldest update first."""
+        entries = []
+        for row in self.rows.values():
+            entry = {
+                "timestamp": iso_timestamp(row["last_update"]),
+                "commodity": row["commodity"],
+                "mandi": row["mandi"],
+                "price": round(row["avg_price"], 2),
+                "max_price": row["max_price"],
+                "volume": row["total_volume"],
+            }
+            if "windows" in row:
+                entry["windows"] = {name: window_entry(window) for name, window in row["windows"].items()}
+            entries.append(entry)
+        entries.sort(key=lambda entry: entry["timestamp"])
+        return entries
+
+    def flush(self):
+        with self._lock:
+            if not self.dirty:
+                return
+            entries = self.snapshot()
+            self.dirty = False
+
+        try:
+            self._write(entries)
+        except BaseException:
+            with self._lock:
+                self.dirty = True  # write it on the next flush instead
+            raise
+
+    def _write(self, entries: list):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(prefix=".live_market.", suffix=".tmp", dir=directory)
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(entries, f, separators=(",", ":"))
+            os.chmod(tmp_path, 0o644)  # mkstemp creates it private
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+
+class PaneWindows:
+    """Sliding windows over raw ticks, reduced once per pane by a PaneAggregator.
+
+    Subscribed to the tick table in place of a Pathway sliding window, so
+    each tick is windowed once however many windows are configured. When
+    a pane closes, every group's results go to ``writer`` as one row: the
+    plain fields come from the shortest window with data, and every
+    window's aggregates are under "windows".
+    """
+
+    def __init__(self, aggregator: PaneAggregator, writer: LatestStateWriter):
+        self.aggregator = aggregator
+        self.writer = writer
+
+    def on_change(self, key, row, time, is_addition):
+        if not is_addition:
+            return  # the tick stream is append-only
+        open_pane = self.aggregator.current
+        self.aggregator.add(
+            row["timestamp"] / 1000, row["commodity"], row["mandi"], row["price"], row["volume"]
+        )
+        if open_pane is not None and self.aggregator.current != open_pane:
+            self.emit()
+
+    def on_end(self):
+        self.aggregator.close()
+        self.emit()
+        self.writer.on_end()
+
+    def emit(self):
+        """Send the windows as of the last closed pane to the writer."""
+        panes = self.aggregator.windows
+        for result in self.aggregator.results():
+            windows = result["windows"]
+            shortest = windows[min(windows, key=panes.get)]
+            self.writer.on_change(None, {
+                "commodity": result["commodity"],
+                "mandi": result["mandi"],
+                "avg_price": shortest["avg_price"],
+                "max_price": shortest["max_price"],
+                "total_volume": shortest["total_volume"],
+                "last_update": shortest["last_update"] * 1000,
+                "windows": windows,
+            }, None, True)
+
 
 def run_processing():
-    # 1. Input: Read from CSV in real-time
+    # 1. Input: Read ticks in real-time, from the CSV or the binary file
     # mode="streaming" treats the file as a stream (tail -f)
-    t = pw.io.csv.read(
-        INPUT_FILE,
-        schema=pw.schema_from_csv(INPUT_FILE),
-        mode="streaming"
-    )
+    t = read_ticks()
 
     # 2. Processing:
     # Filter out bad data if any
     filtered = t.filter(t.price > 0)
 
-    # Windowing: Calculate 10-second moving average per commodity/mandi
-    # In a real app, this might be 1-minute or 1-hour
-    windowed = filtered.window(
-        pw.temporal.sliding(length=pw.temporal.duration("10s"), hop=pw.temporal.duration("2s")),
-        behavior=pw.temporal.exactly_once_behavior(),
-    ).groupby(
-        t.commodity, t.mandi
-    ).reduce(
-        avg_price=pw.reducers.avg(t.price),
-        max_price=pw.reducers.max(t.price),
-        total_volume=pw.reducers.sum(t.volume),
-        last_update=pw.reducers.max(t.timestamp)
-    )
-    
-    # 3. Output: Write to a JSON file that the frontend can poll
-    # We use a custom output to write the latest state to a JSON file
-    # Pathway's `pw.io.json.write` writes a stream of updates (append-only),
-    # but for a simple frontend poller, we often want the "current state" of the window.
-    # For simplicity in this hackathon, we'll use a simple CSV output for the processed data
-    # and a separate small adapter to convert it to JSON, OR just let Pathway write CSV 
-    # and have the frontend read CSV. 
-    # Let's try writing to JSON lines with Pathway and see if frontend handles it.
-    # A better hackathon approach: Write to a static JSON file using a python output connector.
-
-    class JSONFileWriter(pw.io.python.ConnectorSubject):
-        def next(self, row, time, is_added):
-             # This is a simplification. In a real generic connector, we'd handle updates.
-             # For this sliding window, we essentially get a stream of window results.
-             # We will just write the latest batch to the file.
-             pass
-
-    # Simplified Approach for Hackathon:
-    # Use `pw.io.csv.write` to a file, and frontend reads that.
-    # Or to ensure "up-to-dateness", we can use a simpler reduction.
-    
-    # Let's just output the stream to a file.
-    # Note: Pathway outputs are streams. 
-    
-    pw.io.json.write(windowed, filename=OUTPUT_JSON, mode="overwrite")
-
-    print("Pathway processing started. Writing to", OUTPUT_JSON)
+    # 3. Output: Keep the current window results and write them to a JSON
+    # file the frontend can poll. pw.io.json.write would append the raw
+    # update stream instead of a readable current state.
+    writer = LatestStateWriter(OUTPUT_JSON)
+
+    # Windowing: moving averages per commodity/mandi over every configured
+    # window (10s, 1m and 1h by default), all from one pass over the ticks
+    windows = PaneWindows(PaneAggregator.from_config(PANE_HOP, PANE_WINDOWS), writer)
+    pw.io.subscribe(filtered, on_change=windows.on_change, on_end=windows.on_end)
+    writer.start()
+
+    print(f"Pathway processing started ({PANE_WINDOWS} windows, {PANE_HOP} panes). Writing to", OUTPUT_JSON)
     pw.run()
 
 if __name__ == "__main__":
-    # Ensure input file exists
-    if not os.path.exists(INPUT_FILE):
+    # Ensure input file exists (a missing binary file reads as empty)
+    if INPUT_FORMAT == "csv" and not os.path.exists(INPUT_FILE):
         with open(INPUT_FILE, "w") as f:
             f.write("timestamp,commodity,mandi,price,volume\n")
             
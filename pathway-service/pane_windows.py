@@ -0,0 +1,257 @@
+"""
+Pane-based sliding windows over market ticks.
+
+A sliding window of ``length`` moving by ``hop`` holds every tick in
+length / hop windows. Reducing each window from its own ticks, as the
+Pathway ``sliding`` window does, repeats that work for every window it
+lands in; a 1h window with a 2s hop would do it 1800 times. Here a tick
+is added once to the hop-sized pane it falls in. When a pane closes it is
+pushed into every configured window and the panes that slid out are
+evicted: counts, sums and histograms are subtracted back out, and the max
+comes from a two-stack queue. Closing a pane costs O(windows) per group
+however long the windows are, so 10s, 1m and 1h all come from one pass.
+
+Each window reports the average, max, total volume, VWAP and approximate
+percentiles of the price. Percentiles come from log-bucketed histograms,
+which add (and subtract) bucket by bucket like the sums.
+"""
+
+import math
+from collections import deque
+from typing import Dict, List
+
+DEFAULT_HOP = "2s"
+DEFAULT_WINDOWS = "10s,1m,1h"
+PERCENTILES = (0.5, 0.9, 0.99)
+DURATION_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+def parse_duration(text: str) -> float:
+    """Seconds in a duration like "500ms", "10s", "1m" or "1h" (bare numbers are seconds)."""
+    text = text.strip().lower()
+    for unit in sorted(DURATION_UNITS, key=len, reverse=True):
+        if text.endswith(unit):
+            return float(text[: -len(unit)]) * DURATION_UNITS[unit]
+    return float(text)
+
+
+class LogBuckets:
+    """Maps prices to log-spaced buckets; a bucket's value is within ``accuracy`` (relative) of its prices."""
+
+    def __init__(self, accuracy: float = 0.01):
+        self.gamma = (1 + accuracy) / (1 - accuracy)
+        self._log_gamma = math.log(self.gamma)
+
+    def bucket(self, price: float) -> int:
+        # Bucket i holds prices in (gamma ** (i - 1), gamma ** i]
+        return math.ceil(math.log(price) / self._log_gamma)
+
+    def value(self, bucket: int) -> float:
+        return 2 * self.gamma ** bucket / (self.gamma + 1)
+
+    def quantile(self, histogram: Dict[int, int], count: int, q: float) -> float:
+        rank = q * (count - 1)
+        seen = 0
+        for bucket in sorted(histogram):
+            seen += histogram[bucket]
+            if seen > rank:
+                return self.value(bucket)
+        return math.nan
+
+
+class Pane:
+    """Aggregates of one group's ticks within one hop."""
+
+    __slots__ = ("count", "volume", "price_sum", "notional", "max_price", "last_update", "histogram")
+
+    def __init__(self):
+        self.count = 0
+        self.volume = 0
+        self.price_sum = 0.0
+        self.notional = 0.0
+        self.max_price = -math.inf
+        self.last_update = -math.inf
+        self.histogram: Dict[int, int] = {}
+
+    def add(self, timestamp: float, price: float, volume: int, bucket: int):
+        self.count += 1
+        self.volume += volume
+        self.price_sum += price
+        self.notional += price * volume
+        if price > self.max_price:
+            self.max_price = price
+        if timestamp > self.last_update:
+            self.last_update = timestamp
+        self.histogram[bucket] = self.histogram.get(bucket, 0) + 1
+
+
+class MaxQueue:
+    """FIFO queue of numbers with O(1) amortized push, pop and max (two stacks).
+
+    New values go on the back stack, which tracks its own max. When the
+    front runs out, the back is moved over, storing at each entry the max
+    of it and every newer entry still on the front.
+    """
+
+    def __init__(self):
+        self._front: List[float] = []
+        self._back: List[float] = []
+        self._back_max = -math.inf
+
+    def push(self, value: float):
+        self._back.append(value)
+        if value > self._back_max:
+            self._back_max = value
+
+    def pop(self):
+        """Drop the oldest value."""
+        if not self._front:
+            running = -math.inf
+            while self._back:
+                running = max(running, self._back.pop())
+                self._front.append(running)
+            self._back_max = -math.inf
+        self._front.pop()
+
+    def max(self) -> float:
+        return max(self._front[-1] if self._front else -math.inf, self._back_max)
+
+
+class SlidingWindow:
+    """Running aggregates over the last ``panes`` panes of one group."""
+
+    def __init__(self, panes: int):
+        self.panes = panes
+        self.count = 0
+        self.volume = 0
+        self.price_sum = 0.0
+        self.notional = 0.0
+        self.histogram: Dict[int, int] = {}
+        self._queue = deque()  # (pane index, Pane), oldest first
+        self._max = MaxQueue()
+
+    def push(self, index: int, pane: Pane):
+        self._queue.append((index, pane))
+        self._max.push(pane.max_price)
+        self.count += pane.count
+        self.volume += pane.volume
+        self.price_sum += pane.price_sum
+        self.notional += pane.notional
+        histogram = self.histogram
+        for bucket, n in pane.histogram.items():
+            histogram[bucket] = histogram.get(bucket, 0) + n
+
+    def evict(self, newest: int):
+        """Drop panes that are out of the window ending with pane ``newest``."""
+        queue = self._queue
+        while queue and queue[0][0] <= newest - self.panes:
+            _, pane = queue.popleft()
+            self._max.pop()
+            self.count -= pane.count
+            self.volume -= pane.volume
+            self.price_sum -= pane.price_sum
+            self.notional -= pane.notional
+            histogram = self.histogram
+            for bucket, n in pane.histogram.items():
+                left = histogram[bucket] - n
+                if left:
+                    histogram[bucket] = left
+                else:
+                    del histogram[bucket]
+        if not queue:
+            # Start the float sums over instead of carrying rounding residue
+            self.price_sum = self.notional = 0.0
+
+    def result(self, buckets: LogBuckets) -> Dict:
+        result = {
+            "last_update": self._queue[-1][1].last_update,
+            "count": self.count,
+            "avg_price": self.price_sum / self.count,
+            "max_price": self._max.max(),
+            "total_volume": self.volume,
+            "vwap": self.notional / self.volume if self.volume else self.price_sum / self.count,
+        }
+        for q in PERCENTILES:
+            result[f"p{round(q * 100)}"] = buckets.quantile(self.histogram, self.count, q)
+        return result
+
+
+class PaneAggregator:
+    """Sliding windows of several lengths per (commodity, mandi), sharing hop-sized panes.
+
+    Ticks are assigned to panes by event time. A tick from a later pane
+    closes the open one, so windows advance with the stream; ticks for a
+    pane that has already closed are dropped and counted in ``late``,
+    like Pathway's exactly-once window behavior.
+    """
+
+    def __init__(self, hop: float = 2.0, windows: Dict[str, float] = None, accuracy: float = 0.01):
+        windows = windows or {"10s": 10.0, "1m": 60.0, "1h": 3600.0}
+        self.hop = hop
+        self.windows: Dict[str, int] = {}
+        for name, length in windows.items():
+            panes = round(length / hop)
+            if panes < 1 or not math.isclose(panes * hop, length):
+                raise ValueError(f"Window {name} is not a multiple of the {hop}s hop")
+            self.windows[name] = panes
+        self.buckets = LogBuckets(accuracy)
+        self.current = None  # index of the open pane
+        self.late = 0
+        self._open: Dict[tuple, Pane] = {}
+        self._groups: Dict[tuple, List[SlidingWindow]] = {}
+
+    @classmethod
+    def from_config(cls, hop: str = DEFAULT_HOP, windows: str = DEFAULT_WINDOWS, accuracy: float = 0.01):
+        """Aggregator from duration strings, e.g. ``from_config("2s", "10s,1m,1h")``."""
+        names = [name.strip() for name in windows.split(",") if name.strip()]
+        return cls(parse_duration(hop), {name: parse_duration(name) for name in names}, accuracy)
+
+    def add(self, timestamp: float, commodity: str, mandi: str, price: float, volume: int) -> bool:
+        """Add one tick (``timestamp`` in epoch seconds); False if its pane already closed."""
+        index = math.floor(timestamp / self.hop)
+        if self.current is None:
+            self.current = index
+        elif index > self.current:
+            self.close(index)
+        elif index < self.current:
+            self.late += 1
+            return False
+
+        group = (commodity, mandi)
+        pane = self._open.get(group)
+        if pane is None:
+            pane = self._open[group] = Pane()
+        pane.add(timestamp, price, volume, self.buckets.bucket(price))
+        return True
+
+    def close(self, until: int = None):
+        """Close the open pane and slide every window up to (not including) pane ``until``."""
+        if self.current is None:
+            return
+        until = self.current + 1 if until is None else until
+        for group, pane in self._open.items():
+            windows = self._groups.get(group)
+            if windows is None:
+                windows = self._groups[group] = [SlidingWindow(panes) for panes in self.windows.values()]
+            for window in windows:
+                window.push(self.current, pane)
+        self._open = {}
+
+        for group, windows in list(self._groups.items()):
+            for window in windows:
+                window.evict(until - 1)
+            if not any(window.count for window in windows):
+                del self._groups[group]
+        self.current = until
+
+    def results(self) -> List[Dict]:
+        """Per (commodity, mandi), the aggregates of each non-empty window as of the last closed pane."""
+        entries = []
+        for (commodity, mandi), windows in self._groups.items():
+            results = {
+                name: window.result(self.buckets)
+                for name, window in zip(self.windows, windows)
+                if window.count
+            }
+            entries.append({"commodity": commodity, "mandi": mandi, "windows": results})
+        return entries
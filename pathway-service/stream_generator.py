@@ -1,13 +1,24 @@
+import argparse
 import csv
 import time
 import random
 import os
 import datetime
+import multiprocessing as mp
+import signal
+
+from tick_format import epoch_ms, pack, read_dictionary, write_dictionary
 
 # Configuration
 OUTPUT_FILE = "market_data.csv"
+BINARY_OUTPUT_FILE = "market_data.ticks"
 COMMODITIES = ["Rice", "Wheat", "Tomato", "Potato", "Onion"]
 MANDIS = ["Azadpur", "Okhla", "Ghazipur", "Keshopur", "Narela"]
+HEADER = ["timestamp", "commodity", "mandi", "price", "volume"]
+# Load mode: each producer writes the rows that came due in this many seconds at once
+FLUSH_INTERVAL = 0.01
+# ...and at most this many rows per write when it falls behind
+MAX_BATCH_ROWS = 50000
 
 def generate_data():
     """Generates a single row of market data."""
@@ -18,20 +29,187 @@ def generate_data():
     timestamp = datetime.datetime.now().isoformat()
     return [timestamp, commodity, mandi, price, volume]
 
-def main():
-    # Create the file with headers if it doesn't exist
-    if not os.path.exists(OUTPUT_FILE):
-        with open(OUTPUT_FILE, "w", newline="") as f:
+def ensure_header(path):
+    """Create the file with headers if it doesn't exist."""
+    if not os.path.exists(path):
+        with open(path, "w", newline="") as f:
             writer = csv.writer(f)
-            writer.writerow(["timestamp", "commodity", "mandi", "price", "volume"])
+            writer.writerow(HEADER)
+
+def ensure_output(args, commodities=COMMODITIES, mandis=MANDIS):
+    """Prepare ``args.output``: the CSV header, or the binary format's dictionary."""
+    if args.format == "binary":
+        try:
+            known = read_dictionary(args.output)
+        except FileNotFoundError:
+            known = ([], [])
+        # Generated names only ever extend the list, so the longer one keeps every written id valid
+        write_dictionary(args.output, max(known[0], list(commodities), key=len), max(known[1], list(mandis), key=len))
+    else:
+        ensure_header(args.output)
+
+def names(known, prefix, count):
+    """``count`` names: the known ones first, then numbered ones."""
+    return known[:count] + [f"{prefix}{i}" for i in range(len(known) + 1, count + 1)]
+
+def price_sampler(rng, distribution, low, high):
+    """Function drawing prices between ``low`` and ``high`` from ``distribution``."""
+    mid = (low + high) / 2
+    if distribution == "uniform":
+        draw = lambda: rng.uniform(low, high)
+    elif distribution == "normal":
+        draw = lambda: rng.gauss(mid, (high - low) / 6)
+    else:
+        # lognormal: median at the midpoint, long right tail
+        draw = lambda: mid * rng.lognormvariate(0, 0.5)
+    return lambda: round(min(max(draw(), low), high), 2)
+
+class TimestampFormatter:
+    """ISO timestamps with the formatted second cached (formatting dominates row cost)."""
+
+    def __init__(self):
+        self.second = None
+        self.prefix = ""
+
+    def __call__(self, ts):
+        second, micros = divmod(round(ts * 1_000_000), 1_000_000)
+        if second != self.second:
+            self.second = second
+            self.prefix = datetime.datetime.fromtimestamp(second).isoformat()
+        return f"{self.prefix}.{micros:06d}"
+
+def produce(index, args, start, sent, stop):
+    """Producer ``index`` of ``args.producers``: appends its share of ``args.rate`` rows per second.
+
+    Row n of producer i is event n * producers + i of the whole run,
+    timestamped ``start + event / rate``, so with a fixed ``--seed`` and
+    ``--start`` every producer writes the same rows each run (they only
+    interleave differently in the file).
+    """
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # Ctrl+C stops the parent, which stops us
+    rng = random.Random(f"{args.seed}:{index}") if args.seed is not None else random.Random()
+    commodities = names(COMMODITIES, "Commodity", args.commodities)
+    mandis = names(MANDIS, "Mandi", args.mandis)
+    price = price_sampler(rng, args.price_dist, *args.price_range)
+    rate, producers = args.rate, args.producers
+
+    # Both formats draw the same values, so a seed gives the same ticks in either
+    if args.format == "binary":
+        row = lambda ts: pack(
+            round(ts * 1000), rng.randrange(len(commodities)), rng.randrange(len(mandis)),
+            price(), rng.randint(100, 1000)
+        )
+    else:
+        timestamp = TimestampFormatter()
+        row = lambda ts: (
+            f"{timestamp(ts)},{commodities[rng.randrange(len(commodities))]},"
+            f"{mandis[rng.randrange(len(mandis))]},{price()},{rng.randint(100, 1000)}\n"
+        ).encode()
+
+    # O_APPEND: every batch lands whole at the end of the file, even with other producers writing
+    fd = os.open(args.output, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    began = time.monotonic()
+    n = 0
+    try:
+        while not stop.is_set():
+            elapsed = time.monotonic() - began
+            due = int((elapsed * rate - index) / producers) + 1 if elapsed * rate >= index else 0
+            due = min(due, n + MAX_BATCH_ROWS)
+            rows = []
+            while n < due:
+                rows.append(row(start + (n * producers + index) / rate))
+                n += 1
+            if rows:
+                data = b"".join(rows)
+                while data:
+                    data = data[os.write(fd, data):]
+                sent.value = n
+            time.sleep(max(0.0, FLUSH_INTERVAL - (time.monotonic() - began - elapsed)))
+    finally:
+        os.close(fd)
+
+def run_load(args):
+    """Run ``args.producers`` producer processes and report the achieved rate until stopped."""
+    ensure_output(args, names(COMMODITIES, "Commodity", args.commodities), names(MANDIS, "Mandi", args.mandis))
+    start = args.start if args.start is not None else time.time()
+    stop = mp.Event()
+    counters = [mp.Value("q", 0, lock=False) for _ in range(args.producers)]
+    workers = [
+        mp.Process(target=produce, args=(i, args, start, counters[i], stop), daemon=True)
+        for i in range(args.producers)
+    ]
+    print(f"Generating {args.rate:,.0f} rows/s with {args.producers} producers into {args.output}...")
+    for worker in workers:
+        worker.start()
+
+    began = time.monotonic()
+    deadline = began + args.duration if args.duration else float("inf")
+    last_time, last_total = began, 0
+    try:
+        while time.monotonic() < deadline:
+            time.sleep(min(args.report, max(deadline - time.monotonic(), 0.0)))
+            now = time.monotonic()
+            total = sum(counter.value for counter in counters)
+            behind = (now - began) * args.rate - total
+            print(
+                f"{(total - last_total) / (now - last_time):>12,.0f} rows/s "
+                f"(target {args.rate:,.0f}), {total:,} total, {max(behind, 0) / args.rate:.2f}s behind"
+            )
+            last_time, last_total = now, total
+    except KeyboardInterrupt:
+        pass
+    stop.set()
+    for worker in workers:
+        worker.join()
+
+    elapsed = time.monotonic() - began
+    total = sum(counter.value for counter in counters)
+    print(f"\nWrote {total:,} rows in {elapsed:.1f}s: {total / elapsed:,.0f} rows/s achieved (target {args.rate:,.0f})")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Append simulated market ticks to a CSV or binary stream.")
+    parser.add_argument("--format", choices=("csv", "binary"), default="csv",
+                        help="csv rows, or fixed-width binary records (see tick_format.py)")
+    parser.add_argument("--output", default=None,
+                        help=f"default: {OUTPUT_FILE} ({BINARY_OUTPUT_FILE} for --format binary)")
+    parser.add_argument("--rate", type=float, default=0,
+                        help="load mode: target rows per second (default: one row per second, printed)")
+    parser.add_argument("--producers", type=int, default=1, help="load mode: producer processes")
+    parser.add_argument("--duration", type=float, default=0, help="load mode: seconds to run (default: until Ctrl+C)")
+    parser.add_argument("--seed", type=int, default=None, help="load mode: RNG seed for reproducible rows")
+    parser.add_argument("--start", type=float, default=None,
+                        help="load mode: epoch seconds of the first timestamp (default: now)")
+    parser.add_argument("--commodities", type=int, default=len(COMMODITIES), help="load mode: distinct commodities")
+    parser.add_argument("--mandis", type=int, default=len(MANDIS), help="load mode: distinct mandis")
+    parser.add_argument("--price-dist", choices=("uniform", "normal", "lognormal"), default="uniform")
+    parser.add_argument("--price-range", type=float, nargs=2, default=(20.0, 100.0), metavar=("LOW", "HIGH"))
+    parser.add_argument("--report", type=float, default=1.0, help="load mode: seconds between rate reports")
+    args = parser.parse_args(argv)
+    if args.output is None:
+        args.output = BINARY_OUTPUT_FILE if args.format == "binary" else OUTPUT_FILE
+    return args
+
+def main():
+    args = parse_args()
+    if args.rate > 0:
+        run_load(args)
+        return
+
+    ensure_output(args)
 
-    print(f"Streaming data to {OUTPUT_FILE}...")
+    print(f"Streaming data to {args.output}...")
     try:
         while True:
             data = generate_data()
-            with open(OUTPUT_FILE, "a", newline="") as f:
-                writer = csv.writer(f)
-                writer.writerow(data)
+            if args.format == "binary":
+                timestamp, commodity, mandi, price, volume = data
+                record = pack(epoch_ms(timestamp), COMMODITIES.index(commodity), MANDIS.index(mandi), price, volume)
+                with open(args.output, "ab") as f:
+                    f.write(record)
+            else:
+                with open(args.output, "a", newline="") as f:
+                    writer = csv.writer(f)
+                    writer.writerow(data)
             print(f"Written: {data}")
             time.sleep(1) # Simulate real-time data arrival
     except KeyboardInterrupt:
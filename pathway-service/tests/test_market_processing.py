@@ -0,0 +1,53 @@
+import json
+import os
+
+import pytest
+
+pytest.importorskip("pathway")
+from market_processing import LatestStateWriter
+
+
+def window_row(commodity, last_update, avg_price=50.0):
+    return {"commodity": commodity, "mandi": "Okhla", "avg_price": avg_price, "max_price": avg_price,
+            "total_volume": 10, "last_update": last_update}
+
+
+def test_keeps_the_newest_row_per_group(tmp_path):
+    writer = LatestStateWriter(str(tmp_path / "live.json"))
+    for i in range(100):
+        for commodity in ("Rice", "Wheat"):
+            writer.on_change(i, window_row(commodity, 1772188200000 + i * 2000, float(i)), 0, True)
+    assert len(writer.rows) == 2
+    assert writer.rows[("Rice", "Okhla")]["avg_price"] == 99.0
+
+    # A late, older window does not replace the newer one; retracting it is a no-op
+    stale = window_row("Rice", 1772188200000, 1.0)
+    writer.on_change(0, stale, 0, True)
+    writer.on_change(0, stale, 0, False)
+    assert writer.rows[("Rice", "Okhla")]["avg_price"] == 99.0
+    # Retracting the current row drops the group
+    writer.on_change(0, writer.rows[("Rice", "Okhla")], 0, False)
+    assert list(writer.rows) == [("Wheat", "Okhla")]
+
+
+def test_flush_replaces_the_file_whole(tmp_path):
+    path = tmp_path / "live.json"
+    writer = LatestStateWriter(str(path))
+    writer.on_change(0, window_row("Rice", 1772188200000), 0, True)
+    writer.flush()
+    first = json.loads(path.read_text())
+    assert [(e["commodity"], e["price"]) for e in first] == [("Rice", 50.0)]
+
+    # A failed write leaves the previous file and no temp file, and is retried
+    writer.on_change(0, window_row("Rice", 1772188202000, 55.0), 0, True)
+    writer.rows[("Rice", "Okhla")]["max_price"] = object()
+    with pytest.raises(TypeError):
+        writer.flush()
+    assert json.loads(path.read_text()) == first
+    assert os.listdir(tmp_path) == ["live.json"]
+    assert writer.dirty
+
+    writer.rows[("Rice", "Okhla")]["max_price"] = 60.0
+    writer.flush()
+    assert json.loads(path.read_text())[0]["max_price"] == 60.0
+    assert not writer.dirty
@@ -0,0 +1,82 @@
+import math
+import random
+
+import pytest
+
+from pane_windows import MaxQueue, PaneAggregator, parse_duration
+
+
+def test_parse_duration():
+    assert parse_duration("500ms") == 0.5
+    assert parse_duration("10s") == 10
+    assert parse_duration(" 1m ") == 60
+    assert parse_duration("1h") == 3600
+    assert parse_duration("2") == 2
+
+
+def test_windows_must_be_whole_panes():
+    with pytest.raises(ValueError):
+        PaneAggregator.from_config("2s", "5s")
+
+
+def test_max_queue_matches_a_plain_list():
+    rng = random.Random(2)
+    queue, items = MaxQueue(), []
+    for _ in range(2000):
+        if items and rng.random() < 0.45:
+            queue.pop()
+            items.pop(0)
+        else:
+            value = rng.uniform(0, 100)
+            queue.push(value)
+            items.append(value)
+        assert queue.max() == (max(items) if items else -math.inf)
+
+
+def test_windows_match_brute_force():
+    rng = random.Random(1)
+    aggregator = PaneAggregator.from_config("2s", "10s,1m")
+    ticks = []
+    t = 1000.0
+    for _ in range(8000):
+        t += rng.expovariate(50)
+        if rng.random() < 0.004:
+            t += rng.uniform(5, 90)  # quiet gaps longer than a window
+        tick = (t, rng.choice("AB"), rng.choice("xy"), round(rng.uniform(20, 100), 2), rng.randint(100, 1000))
+        ticks.append(tick)
+        aggregator.add(*tick)
+        if rng.random() > 0.005:
+            continue
+
+        closed = aggregator.current  # windows end with the pane before the open one
+        for entry in aggregator.results():
+            for name, panes in (("10s", 5), ("1m", 30)):
+                low, high = (closed - panes) * 2, closed * 2
+                selected = [
+                    tick for tick in ticks
+                    if tick[1:3] == (entry["commodity"], entry["mandi"]) and low <= tick[0] < high
+                ]
+                result = entry["windows"].get(name)
+                if not selected:
+                    assert result is None
+                    continue
+                prices = sorted(tick[3] for tick in selected)
+                volume = sum(tick[4] for tick in selected)
+                assert result["count"] == len(selected)
+                assert math.isclose(result["avg_price"], sum(prices) / len(prices))
+                assert result["max_price"] == prices[-1]
+                assert result["total_volume"] == volume
+                assert math.isclose(result["vwap"], sum(tick[3] * tick[4] for tick in selected) / volume)
+                for q in (0.5, 0.9, 0.99):
+                    exact = prices[int(q * (len(prices) - 1))]
+                    assert abs(result[f"p{round(q * 100)}"] - exact) / exact < 0.011
+    assert aggregator.late == 0
+
+
+def test_ticks_for_closed_panes_are_dropped():
+    aggregator = PaneAggregator.from_config("2s", "10s")
+    assert aggregator.add(10.0, "Rice", "Okhla", 50.0, 1)
+    assert aggregator.add(12.5, "Rice", "Okhla", 60.0, 1)
+    assert not aggregator.add(11.0, "Rice", "Okhla", 70.0, 1)
+    assert aggregator.late == 1
+    assert aggregator.results()[0]["windows"]["10s"]["max_price"] == 50.0
@@ -0,0 +1,39 @@
+from tick_format import RECORD, TickReader, epoch_ms, iso_timestamp, pack, read_dictionary, write_dictionary
+
+
+def test_timestamps_round_trip():
+    assert iso_timestamp(epoch_ms("2026-02-27T10:30:00.125")) == "2026-02-27T10:30:00.125"
+    assert epoch_ms("2026-02-27T10:30:00+00:00") == 1772188200000
+
+
+def test_records_round_trip(tmp_path):
+    path = str(tmp_path / "ticks.bin")
+    write_dictionary(path, ["Rice", "Wheat"], ["Azadpur", "Okhla"])
+    assert read_dictionary(path) == (["Rice", "Wheat"], ["Azadpur", "Okhla"])
+    ticks = [(1772188200000 + i, i % 2, (i + 1) % 2, 20.5 + i, 100 + i) for i in range(5)]
+    with open(path, "wb") as f:
+        f.write(b"".join(pack(*tick) for tick in ticks))
+
+    reader = TickReader(path)
+    assert reader.poll() == [
+        (ts, ["Rice", "Wheat"][c], ["Azadpur", "Okhla"][m], price, volume) for ts, c, m, price, volume in ticks
+    ]
+    assert reader.poll() == []
+
+
+def test_partial_records_and_new_names_wait_for_the_writer(tmp_path):
+    path = str(tmp_path / "ticks.bin")
+    write_dictionary(path, ["Rice"], ["Okhla"])
+    reader = TickReader(path)
+    assert reader.poll() == []  # missing file reads as empty
+
+    record = pack(1772188200000, 1, 0, 42.0, 7)
+    with open(path, "wb") as f:
+        f.write(record[:10])
+    assert reader.poll() == []
+    # The rest of the record arrives with the dictionary entry for its new id
+    write_dictionary(path, ["Rice", "Tomato"], ["Okhla"])
+    with open(path, "ab") as f:
+        f.write(record[10:])
+    assert reader.poll() == [(1772188200000, "Tomato", "Okhla", 42.0, 7)]
+    assert reader.offset == RECORD.size
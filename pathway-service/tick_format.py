@@ -0,0 +1,87 @@
+"""
+Fixed-width binary market ticks, an alternative to the CSV stream.
+
+A tick file holds back-to-back 24-byte little-endian records:
+
+    timestamp  int64    epoch milliseconds
+    commodity  uint16   id in the dictionary
+    mandi      uint16   id in the dictionary
+    price      float64
+    volume     uint32
+
+Commodity and mandi names live in a JSON sidecar, ``<path>.dict.json``
+({"commodity": [...], "mandi": [...]}, ids are list positions), written
+whole and renamed into place. A reader only has to split complete
+records and look up two ids, instead of tokenizing text and parsing an
+ISO timestamp per row. Like the CSV, the file is append-only.
+"""
+
+import json
+import os
+import struct
+from datetime import datetime
+from typing import List, Sequence, Tuple
+
+RECORD = struct.Struct("<qHHdI")
+
+
+def dictionary_path(path: str) -> str:
+    return path + ".dict.json"
+
+
+def write_dictionary(path: str, commodities: Sequence[str], mandis: Sequence[str]):
+    """Write the id -> name sidecar of the tick file ``path``."""
+    target = dictionary_path(path)
+    with open(target + ".tmp", "w") as f:
+        json.dump({"commodity": list(commodities), "mandi": list(mandis)}, f)
+    os.replace(target + ".tmp", target)
+
+
+def read_dictionary(path: str) -> Tuple[List[str], List[str]]:
+    with open(dictionary_path(path)) as f:
+        names = json.load(f)
+    return names["commodity"], names["mandi"]
+
+
+def epoch_ms(timestamp: str) -> int:
+    """ISO 8601 timestamp (naive ones are local time, as the generator writes them) as epoch milliseconds."""
+    return round(datetime.fromisoformat(timestamp).timestamp() * 1000)
+
+
+def iso_timestamp(ms: float) -> str:
+    return datetime.fromtimestamp(ms / 1000).isoformat(timespec="milliseconds")
+
+
+def pack(timestamp_ms: int, commodity: int, mandi: int, price: float, volume: int) -> bytes:
+    return RECORD.pack(timestamp_ms, commodity, mandi, price, volume)
+
+
+class TickReader:
+    """Decodes the records appended to a tick file since the last ``poll()``."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.offset = 0
+        self.commodities: List[str] = []
+        self.mandis: List[str] = []
+
+    def poll(self, max_bytes: int = RECORD.size * 65536) -> List[tuple]:
+        """``(timestamp_ms, commodity, mandi, price, volume)`` of new complete records, in file order."""
+        try:
+            with open(self.path, "rb") as f:
+                f.seek(self.offset)
+                chunk = f.read(max_bytes)
+        except FileNotFoundError:
+            return []
+        # A record still being written is picked up by the next poll
+        chunk = chunk[: len(chunk) - len(chunk) % RECORD.size]
+        if not chunk:
+            return []
+        self.offset += len(chunk)
+
+        records = list(RECORD.iter_unpack(chunk))
+        if max(r[1] for r in records) >= len(self.commodities) or max(r[2] for r in records) >= len(self.mandis):
+            # Ids we have no name for yet: the writer extended the dictionary
+            self.commodities, self.mandis = read_dictionary(self.path)
+        commodities, mandis = self.commodities, self.mandis
+        return [(ts, commodities[c], mandis[m], price, volume) for ts, c, m, price, volume in records]